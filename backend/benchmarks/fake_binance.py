@@ -0,0 +1,191 @@
+"""Offline stand-in for the Binance REST API, used by the benchmark runner.
+
+Ticker responses replay the synthetic miniTicker frames in
+``fixtures/mini_ticker_arr.ndjson`` (evenly spaced, constant volume; not a
+live capture), moving to the next frame every
+``frame_interval`` seconds so prices keep changing. Klines are generated
+deterministically from each pair's fixture price, so paging and repeated
+runs always see the same candles. Every request is delayed by ``latency``
+seconds and counted per path; ``GET /__stats`` returns the counts and
+``POST /__reset`` clears them.
+
+    python -m benchmarks.fake_binance --port 18081 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from services.quote_cache import INTERVAL_SECONDS
+from services.stream_ingester import parse_ticker_event
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "mini_ticker_arr.ndjson")
+
+
+def load_frames(path: str) -> List[Dict[str, Dict]]:
+    """Fixture frames as full {pair: ticker record} snapshots, in file order.
+
+    Array streams only carry pairs that changed, so each snapshot starts from
+    the previous one.
+    """
+    frames = []
+    current: Dict[str, Dict] = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                records = (parse_ticker_event(event) for event in json.loads(line))
+                current = dict(current, **{record["symbol"]: record for record in records if record is not None})
+                frames.append(current)
+    return frames
+
+
+class FakeBinance:
+    def __init__(self, fixture_path: str = DEFAULT_FIXTURE, latency: float = 0.0, frame_interval: float = 1.0):
+        frames = load_frames(fixture_path)
+        # Replay from the first frame that quotes every pair
+        self.frames = [frame for frame in frames if len(frame) == len(frames[-1])]
+        self.pairs = sorted(self.frames[-1])
+        self.latency = latency
+        self.frame_interval = frame_interval
+        self.counts: Dict[str, int] = {}
+        self.started = time.monotonic()
+
+    def frame(self) -> Dict[str, Dict]:
+        index = int((time.monotonic() - self.started) / self.frame_interval) % len(self.frames)
+        return self.frames[index]
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/ticker/price", self.ticker_price)
+        app.router.add_get("/ticker/24hr", self.ticker_24hr)
+        app.router.add_get("/klines", self.klines)
+        app.router.add_get("/depth", self.depth)
+        app.router.add_get("/exchangeInfo", self.exchange_info)
+        app.router.add_get("/__stats", self.stats)
+        app.router.add_post("/__reset", self.reset)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        if request.path.startswith("/__"):
+            return await handler(request)
+        self.counts[request.path] = self.counts.get(request.path, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def _selected(self, request: web.Request) -> Optional[List[str]]:
+        """Pairs named by ?symbol= or ?symbols=, None for all; raises 400 like Binance for unknown pairs"""
+        if "symbol" in request.query:
+            pairs = [request.query["symbol"]]
+        elif "symbols" in request.query:
+            pairs = json.loads(request.query["symbols"])
+        else:
+            return None
+        if any(pair not in self.frames[-1] for pair in pairs):
+            raise web.HTTPBadRequest(
+                text=json.dumps({"code": -1121, "msg": "Invalid symbol."}), content_type="application/json"
+            )
+        return pairs
+
+    def _tickers(self, request: web.Request, render) -> web.Response:
+        pairs = self._selected(request)
+        frame = self.frame()
+        rows = [render(frame[pair]) for pair in (pairs or self.pairs)]
+        return web.json_response(rows[0] if "symbol" in request.query else rows)
+
+    async def ticker_price(self, request: web.Request) -> web.Response:
+        return self._tickers(request, lambda record: {"symbol": record["symbol"], "price": str(record["price"])})
+
+    async def ticker_24hr(self, request: web.Request) -> web.Response:
+        return self._tickers(request, lambda record: {
+            "symbol": record["symbol"],
+            "priceChange": str(record["priceChange"]),
+            "priceChangePercent": str(record["priceChangePercent"]),
+            "lastPrice": str(record["lastPrice"]),
+            "openPrice": str(record["openPrice"]),
+            "highPrice": str(record["highPrice"]),
+            "lowPrice": str(record["lowPrice"]),
+            "volume": str(record["volume"]),
+        })
+
+    async def klines(self, request: web.Request) -> web.Response:
+        pair = self._selected(request)[0]
+        interval = request.query.get("interval", "1d")
+        interval_ms = INTERVAL_SECONDS.get(interval, 60) * 1000
+        limit = min(int(request.query.get("limit", 500)), 1000)
+        now = int(time.time() * 1000) // interval_ms * interval_ms
+        end = min(int(request.query.get("endTime", now)), now)
+        if "startTime" in request.query:
+            start = -(-int(request.query["startTime"]) // interval_ms) * interval_ms
+        else:
+            start = end // interval_ms * interval_ms - (limit - 1) * interval_ms
+        base = self.frames[-1][pair]["price"]
+        seed = zlib.crc32(f"{pair}{interval}".encode())
+
+        def close_at(open_time: int) -> float:
+            step = open_time // interval_ms
+            noise = ((zlib.crc32(f"{seed}:{step}".encode()) % 2001) - 1000) / 1000
+            return base * (1 + 0.05 * math.sin(step / 30 * 2 * math.pi) + 0.02 * math.sin(step / 7 * 2 * math.pi) + 0.01 * noise)
+
+        rows = []
+        open_time = start
+        while open_time <= end and len(rows) < limit:
+            close = close_at(open_time)
+            open_price = close_at(open_time - interval_ms)
+            rows.append([
+                open_time, f"{open_price:.8f}", f"{max(open_price, close) * 1.01:.8f}",
+                f"{min(open_price, close) * 0.99:.8f}", f"{close:.8f}", "1000.00000000",
+                open_time + interval_ms - 1, f"{close * 1000:.8f}", 100, "500.00000000", f"{close * 500:.8f}", "0",
+            ])
+            open_time += interval_ms
+        return web.json_response(rows)
+
+    async def depth(self, request: web.Request) -> web.Response:
+        pair = self._selected(request)[0]
+        limit = int(request.query.get("limit", 100))
+        price = self.frame()[pair]["price"]
+        tick = price * 0.0001
+        return web.json_response({
+            "lastUpdateId": int(time.time() * 1000),
+            "bids": [[f"{price - tick * (i + 1):.8f}", f"{1 + i % 5:.8f}"] for i in range(limit)],
+            "asks": [[f"{price + tick * (i + 1):.8f}", f"{1 + i % 5:.8f}"] for i in range(limit)],
+        })
+
+    async def exchange_info(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "rateLimits": [{"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000}],
+            "symbols": [
+                {"symbol": pair, "status": "TRADING", "baseAsset": pair[:-4], "quoteAsset": "USDT"}
+                for pair in self.pairs
+            ],
+        })
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.counts)
+
+    async def reset(self, request: web.Request) -> web.Response:
+        self.counts = {}
+        return web.json_response(self.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fixture Binance payloads for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every upstream request")
+    parser.add_argument("--frame-interval", type=float, default=1.0, help="seconds between fixture ticker frames")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    args = parser.parse_args()
+    fake = FakeBinance(args.fixture, latency=args.latency_ms / 1000, frame_interval=args.frame_interval)
+    web.run_app(fake.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Offline benchmark for the API hot paths.
+
+Starts the fake Binance server and the API (uvicorn, one worker) as
+subprocesses against a throwaway SQLite database, then drives:
+
+  portfolio_save  POST /portfolio/save with --holdings rows per portfolio
+  portfolio_get   GET /portfolio/{user_id}
+  forecast        GET /forecast/{coin_id}
+  ws_prices       --ws-clients concurrent delta-mode /ws/prices clients
+
+Each HTTP scenario reports throughput, p50/p95/p99 latency, errors and the
+upstream requests it caused; the websocket scenario reports connect latency,
+frames received and frame lag. Results are written as JSON (with the git
+commit) so runs can be compared across commits.
+
+    cd backend && python -m benchmarks.run --requests 500 --concurrency 20 --ws-clients 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List
+
+import aiohttp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+SYMBOLS = ["BTC", "ETH", "BNB", "SOL", "ADA", "DOT", "AVAX", "MATIC", "LINK", "UNI"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def wait_until_up(session: aiohttp.ClientSession, url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout}s")
+        await asyncio.sleep(0.2)
+
+
+class Benchmark:
+    def __init__(self, args):
+        self.args = args
+        self.fake_url = f"http://127.0.0.1:{free_port()}"
+        self.api_url = f"http://127.0.0.1:{free_port()}"
+        self.processes: List[subprocess.Popen] = []
+        self.session: aiohttp.ClientSession = None
+
+    def start_processes(self, database_path: str):
+        env = dict(
+            os.environ,
+            PYTHONPATH=BACKEND_DIR,
+            BINANCE_BASE_URL=self.fake_url,
+            DATABASE_URL=f"sqlite:///{database_path}",
+            STREAM_ENABLED="false",
+            VALUATION_SNAPSHOT_INTERVAL="0",
+        )
+        fake_port = self.fake_url.rsplit(":", 1)[1]
+        api_port = self.api_url.rsplit(":", 1)[1]
+        output = None if self.args.verbose else subprocess.DEVNULL
+        self.processes.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_binance", "--port", fake_port,
+             "--latency-ms", str(self.args.latency_ms), "--frame-interval", str(self.args.frame_interval)],
+            cwd=BACKEND_DIR, env=env, stdout=output, stderr=output,
+        ))
+        self.processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", api_port, "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=output, stderr=output,
+        ))
+
+    def stop_processes(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    async def upstream_counts(self) -> Dict[str, int]:
+        async with self.session.get(f"{self.fake_url}/__stats") as response:
+            return await response.json()
+
+    async def reset_upstream(self):
+        async with self.session.post(f"{self.fake_url}/__reset"):
+            pass
+
+    async def http_scenario(self, make_request: Callable[[int], Awaitable[int]]) -> Dict:
+        """Run --requests calls of ``make_request(i)`` with --concurrency in flight"""
+        await self.reset_upstream()
+        latencies: List[float] = []
+        errors = 0
+        counter = iter(range(self.args.requests))
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    status = await make_request(i)
+                except aiohttp.ClientError:
+                    status = 0
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            "requests": self.args.requests,
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            **summarize_latencies(latencies),
+            "upstream_requests": await self.upstream_counts(),
+        }
+
+    def holdings(self, i: int) -> List[Dict]:
+        rng = random.Random(i)
+        return [
+            {
+                "symbol": SYMBOLS[n % len(SYMBOLS)],
+                # Nudge one row per save so the diff has an update to write
+                "amount": round(1 + n * 0.1 + (0.5 if n == i % self.args.holdings else 0), 4),
+                "purchase_price": round(rng.uniform(1, 1000), 2),
+                "purchase_date": f"2024-{1 + n % 12:02d}-{1 + n % 28:02d}",
+            }
+            for n in range(self.args.holdings)
+        ]
+
+    async def post_save(self, i: int) -> int:
+        payload = {"user_id": 1 + i % self.args.users, "portfolio_name": "Benchmark", "holdings": self.holdings(i)}
+        async with self.session.post(f"{self.api_url}/portfolio/save", json=payload) as response:
+            await response.read()
+            return response.status
+
+    async def get_portfolio(self, i: int) -> int:
+        async with self.session.get(f"{self.api_url}/portfolio/{1 + i % self.args.users}") as response:
+            await response.read()
+            return response.status
+
+    async def get_forecast(self, i: int) -> int:
+        async with self.session.get(f"{self.api_url}/forecast/{SYMBOLS[i % len(SYMBOLS)]}") as response:
+            await response.read()
+            return response.status
+
+    async def ws_scenario(self) -> Dict:
+        """Hold --ws-clients delta-mode clients open for --ws-duration seconds"""
+        await self.reset_upstream()
+        url = self.api_url.replace("http://", "ws://") + "/ws/prices?mode=delta&max_rate=10"
+        connect_latencies: List[float] = []
+        lags: List[float] = []
+        frames = 0
+        failures = 0
+        deadline = time.monotonic() + self.args.ws_duration
+
+        async def client():
+            nonlocal frames, failures
+            started = time.perf_counter()
+            try:
+                async with self.session.ws_connect(url) as ws:
+                    connect_latencies.append(time.perf_counter() - started)
+                    while time.monotonic() < deadline:
+                        try:
+                            message = await ws.receive(timeout=max(0.01, deadline - time.monotonic()))
+                        except asyncio.TimeoutError:
+                            break
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        frames += 1
+                        lags.append(max(0.0, time.time() - json.loads(message.data)["ts"] / 1000))
+            except aiohttp.ClientError:
+                failures += 1
+
+        await asyncio.gather(*(client() for _ in range(self.args.ws_clients)))
+        return {
+            "clients": self.args.ws_clients,
+            "failures": failures,
+            "duration_s": self.args.ws_duration,
+            "frames": frames,
+            "frames_per_s": round(frames / self.args.ws_duration, 2),
+            "connect": summarize_latencies(connect_latencies),
+            "frame_lag": summarize_latencies(lags),
+            "upstream_requests": await self.upstream_counts(),
+        }
+
+    async def run(self) -> Dict:
+        with tempfile.TemporaryDirectory() as tmp:
+            self.start_processes(os.path.join(tmp, "benchmark.db"))
+            try:
+                connector = aiohttp.TCPConnector(limit=0)
+                async with aiohttp.ClientSession(connector=connector) as session:
+                    self.session = session
+                    await wait_until_up(session, f"{self.fake_url}/__stats")
+                    await wait_until_up(session, f"{self.api_url}/")
+                    scenarios = {}
+                    for name, run in (
+                        ("portfolio_save", lambda: self.http_scenario(self.post_save)),
+                        ("portfolio_get", lambda: self.http_scenario(self.get_portfolio)),
+                        ("forecast", lambda: self.http_scenario(self.get_forecast)),
+                        ("ws_prices", self.ws_scenario),
+                    ):
+                        if name in self.args.skip:
+                            continue
+                        print(f"Running {name}...")
+                        scenarios[name] = await run()
+            finally:
+                self.stop_processes()
+        return {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "config": {name: value for name, value in vars(self.args).items() if name != "output"},
+            "scenarios": scenarios,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against a fake Binance server")
+    parser.add_argument("--requests", type=int, default=200, help="requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="HTTP requests in flight")
+    parser.add_argument("--users", type=int, default=10, help="distinct users/portfolios to spread requests over")
+    parser.add_argument("--holdings", type=int, default=50, help="holdings per saved portfolio")
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--ws-duration", type=float, default=10.0, help="seconds to keep websocket clients open")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake Binance latency per request")
+    parser.add_argument("--frame-interval", type=float, default=1.0, help="seconds between fake price updates")
+    parser.add_argument("--skip", nargs="*", default=[], help="scenarios to skip")
+    parser.add_argument("--output", help="result file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--verbose", action="store_true", help="show fake server and API output")
+    args = parser.parse_args()
+
+    results = asyncio.run(Benchmark(args).run())
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['commit']}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name, result in results["scenarios"].items():
+        if "throughput_rps" in result:
+            print(f"{name:15} {result['throughput_rps']:>9} req/s  p50 {result['p50_ms']}ms  "
+                  f"p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms  errors {result['errors']}  "
+                  f"upstream {sum(result['upstream_requests'].values())}")
+        else:
+            print(f"{name:15} {result['frames_per_s']:>9} frames/s  lag p95 {result['frame_lag']['p95_ms']}ms  "
+                  f"connect p95 {result['connect']['p95_ms']}ms  failures {result['failures']}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Startup and response-encoding benchmark.
+
+  import_main     cold ``import main`` in a fresh interpreter
+  time_to_ready   from launching uvicorn to the first answered request,
+                  against the fake Binance server
+  encoding        a large /portfolio and /compare payload through the old
+                  path (jsonable_encoder + JSONResponse) and the typed one
+                  (response model + the app's response class), and a hub
+                  snapshot frame through json.dumps and utils.encoding.dumps
+
+Startup scenarios take the median of --runs fresh processes after one warm-up
+run. ``--backend-dir`` points them at another checkout (e.g. a worktree of an
+older commit) to compare; the encoding scenario always uses this tree.
+
+    cd backend && python -m benchmarks.startup --runs 7 --holdings 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+import aiohttp
+
+from benchmarks.run import BACKEND_DIR, RESULTS_DIR, SYMBOLS, free_port, git_commit, wait_until_up
+
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def backend_env(database_path: str, **extra) -> Dict[str, str]:
+    return dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database_path}",
+        STREAM_ENABLED="false",
+        VALUATION_SNAPSHOT_INTERVAL="0",
+        LOG_LEVEL="WARNING",
+        **extra,
+    )
+
+
+def summarize(samples) -> Dict[str, float]:
+    """Median and spread in milliseconds"""
+    values = [sample * 1000 for sample in samples]
+    return {
+        "median_ms": round(statistics.median(values), 2),
+        "min_ms": round(min(values), 2),
+        "max_ms": round(max(values), 2),
+        "runs": len(values),
+    }
+
+
+def import_main(backend_dir: str, database_path: str, runs: int) -> Dict[str, float]:
+    env = backend_env(database_path, PYTHONPATH=backend_dir)
+    samples = []
+    # The warm-up run compiles bytecode and, on older commits, creates the schema
+    for _ in range(runs + 1):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], cwd=backend_dir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return summarize(samples[1:])
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, timeout: float = 30.0):
+    """Like run.wait_until_up, polling often enough to time startup"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout}s")
+        await asyncio.sleep(0.01)
+
+
+async def time_to_ready(backend_dir: str, database_path: str, runs: int) -> Dict[str, float]:
+    fake_url = f"http://127.0.0.1:{free_port()}"
+    env = backend_env(database_path, PYTHONPATH=backend_dir, BINANCE_BASE_URL=fake_url)
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_binance", "--port", fake_url.rsplit(":", 1)[1], "--latency-ms", "0"],
+        cwd=BACKEND_DIR, env=dict(env, PYTHONPATH=BACKEND_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    samples = []
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_until_up(session, f"{fake_url}/__stats")
+            for _ in range(runs + 1):
+                api_url = f"http://127.0.0.1:{free_port()}"
+                started = time.perf_counter()
+                api = subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "main:app", "--port", api_url.rsplit(":", 1)[1], "--log-level", "warning"],
+                    cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                try:
+                    await wait_ready(session, f"{api_url}/")
+                    samples.append(time.perf_counter() - started)
+                finally:
+                    api.terminate()
+                    api.wait(timeout=10)
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+    return summarize(samples[1:])
+
+
+def best_of(call: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def compare_encoders(name: str, payload, model, repeat: int) -> Dict:
+    """Old and typed encoding of one payload, plus the encoded size"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    import main
+
+    def untyped():
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def typed():
+        content = model.model_validate(payload).model_dump(mode="json", exclude_unset=True)
+        return main.app.router.default_response_class(content).body
+
+    assert json.loads(untyped()) == json.loads(typed())
+    result = {
+        "untyped_ms": round(best_of(untyped, repeat) * 1000, 3),
+        "typed_ms": round(best_of(typed, repeat) * 1000, 3),
+        "bytes": len(typed()),
+    }
+    result["speedup"] = round(result["untyped_ms"] / result["typed_ms"], 2)
+    print(f"  {name}: {result}")
+    return result
+
+
+def encoding(holdings: int, portfolios: int, repeat: int) -> Dict[str, Dict]:
+    import main
+    from utils.encoding import dumps
+
+    symbols = [f"{SYMBOLS[i % len(SYMBOLS)]}{i // len(SYMBOLS) or ''}" for i in range(max(holdings // 10, 10))]
+    portfolio = {
+        "portfolio_id": 1,
+        "portfolio_name": "Benchmark",
+        "holdings": [
+            {
+                "id": i,
+                "symbol": symbols[i % len(symbols)],
+                "amount": 1.5 + i % 7,
+                "purchase_price": 100.0 + i % 50,
+                "purchase_date": "2024-01-01T00:00:00",
+                "current_price": 120.25,
+                "change24h": -1.75,
+                "value": (1.5 + i % 7) * 120.25,
+            }
+            for i in range(holdings)
+        ],
+    }
+    compared = symbols[:50]
+    comparison = {
+        "message": "Portfolio comparison for user 1",
+        "interval": "1d",
+        "candles": 90,
+        "confidence": 0.95,
+        "unpriced": [],
+        "portfolios": [
+            {
+                "portfolio_id": i,
+                "portfolio_name": f"Portfolio {i}",
+                "weights": {symbol: round(1 / len(compared), 4) for symbol in compared},
+                "analysis": {"total_return": 12.5, "volatility": 3.1, "sharpe_ratio": 1.2, "max_drawdown": -20.4},
+            }
+            for i in range(portfolios)
+        ],
+        "covariance": {a: {b: 0.00012345 for b in compared} for a in compared},
+        "correlation": {a: {b: 0.8765 for b in compared} for a in compared},
+    }
+    snapshot = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "prices": {
+            symbol: {"price": 123.456, "change_24h": 1.5, "price_change": 1.85, "last_price": 123.456}
+            for symbol in symbols
+        },
+    }
+
+    print("Running encoding...")
+    results = {
+        "portfolio": compare_encoders("portfolio", portfolio, main.PortfolioOut, repeat),
+        "compare": compare_encoders("compare", comparison, main.PortfolioComparison, repeat),
+    }
+    frame = {
+        "json_dumps_ms": round(best_of(lambda: json.dumps(snapshot), repeat) * 1000, 3),
+        "dumps_ms": round(best_of(lambda: dumps(snapshot), repeat) * 1000, 3),
+        "bytes": len(dumps(snapshot)),
+    }
+    frame["speedup"] = round(frame["json_dumps_ms"] / frame["dumps_ms"], 2)
+    print(f"  ws_frame: {frame}")
+    results["ws_frame"] = frame
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API startup and response encoding")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per startup scenario")
+    parser.add_argument("--backend-dir", default=BACKEND_DIR, help="backend checkout to time startup for")
+    parser.add_argument("--holdings", type=int, default=2000, help="holdings in the encoded portfolio")
+    parser.add_argument("--portfolios", type=int, default=20, help="portfolios in the encoded comparison")
+    parser.add_argument("--repeat", type=int, default=20, help="encodings per payload (best is reported)")
+    parser.add_argument("--skip", nargs="*", default=[], help="scenarios to skip")
+    parser.add_argument("--output", help="result file (default benchmarks/results/<time>-<commit>-startup.json)")
+    args = parser.parse_args()
+    backend_dir = os.path.abspath(args.backend_dir)
+
+    scenarios = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "import_main" not in args.skip:
+            print("Running import_main...")
+            scenarios["import_main"] = import_main(backend_dir, os.path.join(tmp, "import.db"), args.runs)
+        if "time_to_ready" not in args.skip:
+            print("Running time_to_ready...")
+            scenarios["time_to_ready"] = asyncio.run(time_to_ready(backend_dir, os.path.join(tmp, "ready.db"), args.runs))
+        if "encoding" not in args.skip:
+            # Importing main here must not touch the real database
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'encoding.db')}"
+            os.environ.setdefault("LOG_LEVEL", "WARNING")
+            scenarios["encoding"] = encoding(args.holdings, args.portfolios, args.repeat)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "scenarios": scenarios,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['commit']}-startup.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name in ("import_main", "time_to_ready"):
+        if name in scenarios:
+            result = scenarios[name]
+            print(f"{name:15} median {result['median_ms']}ms  min {result['min_ms']}ms  max {result['max_ms']}ms")
+    for name, result in scenarios.get("encoding", {}).items():
+        print(f"{name:15} {result['bytes']:>9} bytes  {result['speedup']}x faster")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,51 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 import asyncio
-from datetime import datetime
+import logging
+import os
+import tempfile
+import time
+from functools import partial
+from datetime import datetime, timedelta, timezone
 import uvicorn
 from services.binance_service import BinanceService
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from utils.database import get_db, engine
-from models.models import Base, User, Portfolio, Holding
-from sqlalchemy import text
+from services.market_data_hub import MarketDataHub
+from services.quote_cache import QuoteCache
+from services.candle_store import CandleStore
+from services.connection_manager import ConnectionManager
+from services.forecast_engine import ForecastEngine
+from services.holdings_io import detect_format, export_holdings, import_holdings
+from services.portfolio_service import save_portfolio_holdings
+from services.order_book import OrderBookMirror, estimate_liquidation
+from services.price_bus import PriceBus
+from services.price_subscriptions import PriceSubscription
+from services.rate_governor import RateGovernor
+from services.symbol_registry import SymbolRegistry
+from services.stream_ingester import BinanceStreamSource, QuoteTable, ReplayStreamSource, StreamIngester
+from services.valuation_snapshots import ValuationRecorder, load_history
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from utils.database import AsyncSessionLocal, get_async_db, async_engine, engine
+from models.models import Holding, Portfolio
+from sqlalchemy import func, select, text
+from utils import config
+from utils.migrations import run_migrations
+from utils.logging_setup import configure_logging
+from utils.encoding import ResponseClass
+from utils import metrics
+from prometheus_client import CONTENT_TYPE_LATEST
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+configure_logging(config.LOG_LEVEL, config.LOG_FORMAT)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Crypto Portfolio Tracker API")
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],  # Frontend Vite default port
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Time every statement on both engines for /metrics
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
 
 # Models
 class CoinManual(BaseModel):
@@ -44,63 +65,295 @@ class HoldingData(BaseModel):
     purchase_price: float
     purchase_date: str
 
+class ForecastBatch(BaseModel):
+    symbols: List[str]
+    model: str = config.FORECAST_DEFAULT_MODEL
+    interval: str = "1d"
+    lookback: int = Field(30, ge=2, le=1000)
+
+# Response models: pydantic-core validates and serializes these, the response class only writes bytes
+class HoldingOut(BaseModel):
+    id: int
+    symbol: str
+    amount: float
+    purchase_price: float
+    purchase_date: Optional[str] = None
+    current_price: float
+    change24h: float
+    value: float
+
+class PortfolioOut(BaseModel):
+    message: Optional[str] = None
+    portfolio_id: Optional[int] = None
+    portfolio_name: Optional[str] = None
+    holdings: List[HoldingOut]
+
+class PriceOut(BaseModel):
+    symbol: str
+    price: float
+    change_24h: float
+    price_change: float
+    last_price: float
+
+class HistoryPoint(BaseModel):
+    timestamp: int
+    total_value: float
+    cost_basis: float
+    pnl: float
+    low: float
+    high: float
+    samples: int
+    coin_values: Dict[str, float]
+
+class PortfolioHistory(BaseModel):
+    message: Optional[str] = None
+    portfolio_id: Optional[int] = None
+    portfolio_name: Optional[str] = None
+    bucket_ms: Optional[int] = None
+    history: List[HistoryPoint]
+
+class PortfolioAnalysis(BaseModel):
+    portfolio_id: int
+    portfolio_name: str
+    weights: Dict[str, float]
+    analysis: Dict[str, Optional[float]]
+
+class PortfolioComparison(BaseModel):
+    message: str
+    interval: Optional[str] = None
+    candles: Optional[int] = None
+    confidence: Optional[float] = None
+    unpriced: List[str] = []
+    portfolios: List[PortfolioAnalysis]
+    covariance: Dict[str, Dict[str, Optional[float]]] = {}
+    correlation: Dict[str, Dict[str, Optional[float]]] = {}
+
+# Quote cache shared by every endpoint and the market-data hub
+quote_cache = QuoteCache(
+    ttls={
+        "price": config.QUOTE_CACHE_PRICE_TTL,
+        "24hr": config.QUOTE_CACHE_24HR_TTL,
+        "depth": config.QUOTE_CACHE_DEPTH_TTL,
+    },
+    stale_ttls={
+        "price": config.QUOTE_CACHE_PRICE_STALE_TTL,
+        "24hr": config.QUOTE_CACHE_24HR_STALE_TTL,
+        "klines": config.QUOTE_CACHE_KLINES_STALE_TTL,
+    },
+    max_entries=config.QUOTE_CACHE_MAX_ENTRIES,
+)
+
+# Shared Binance client; its connection pool lives as long as the app
+binance_service = BinanceService(
+    base_url=config.BINANCE_BASE_URL,
+    limit=config.BINANCE_POOL_LIMIT,
+    limit_per_host=config.BINANCE_POOL_LIMIT_PER_HOST,
+    timeout=config.BINANCE_TIMEOUT,
+    connect_timeout=config.BINANCE_CONNECT_TIMEOUT,
+    dns_cache_ttl=config.BINANCE_DNS_CACHE_TTL,
+    keepalive_timeout=config.BINANCE_KEEPALIVE_TIMEOUT,
+    cache=quote_cache,
+)
+binance_service.governor = RateGovernor(
+    weight_limit=config.BINANCE_WEIGHT_LIMIT,
+    reserve=config.BINANCE_WEIGHT_RESERVE,
+    max_wait=config.BINANCE_MAX_WAIT,
+    failure_threshold=config.BINANCE_BREAKER_FAILURES,
+    cooldown=config.BINANCE_BREAKER_COOLDOWN,
+)
+binance_service.candle_store = CandleStore(binance_service, engine, sync_interval=config.CANDLE_SYNC_INTERVAL)
+
+# exchangeInfo-backed pair routing, so unknown coins are rejected without an upstream call
+symbol_registry = SymbolRegistry(binance_service, refresh_interval=config.SYMBOL_REFRESH_INTERVAL)
+binance_service.registry = symbol_registry
+
+# Forecast models run in worker processes, never on the event loop. Each API worker has
+# its own pool, so by default the CPUs are split between them
+forecast_engine = ForecastEngine(
+    binance_service,
+    workers=config.FORECAST_WORKERS or max(1, (os.cpu_count() or 1) // max(config.WORKERS, 1)),
+    max_entries=config.FORECAST_CACHE_MAX_ENTRIES,
+)
+
+# Scrape-time gauges over counters the components already keep
+metrics.gauge("quote_cache_hit_ratio", "Share of quote lookups served from cache", lambda: quote_cache.stats()["hit_ratio"])
+metrics.gauge("quote_cache_entries", "Entries in the quote cache", lambda: quote_cache.stats()["size"])
+metrics.gauge("forecast_cache_hit_ratio", "Share of forecasts served from cache", lambda: forecast_engine.stats()["hit_ratio"])
+metrics.gauge("binance_weight_tokens", "Request weight left in the client-side budget", lambda: binance_service.governor.stats()["tokens"])
+metrics.gauge("binance_circuit_open", "1 while the Binance circuit breaker is open", lambda: float(binance_service.governor.is_open))
+
+# Dependency
+def get_binance_service() -> BinanceService:
+    return binance_service
+
+# Upstream stream ingestion feeding the last-quote table every endpoint reads first
+stream_ingester = None
+if config.STREAM_ENABLED:
+    if config.STREAM_REPLAY_FILE:
+        stream_source = ReplayStreamSource(config.STREAM_REPLAY_FILE)
+    else:
+        stream_source = BinanceStreamSource(lambda: binance_service.session, config.BINANCE_STREAM_URL)
+    binance_service.quote_table = QuoteTable(max_age=config.STREAM_MAX_QUOTE_AGE)
+    stream_ingester = StreamIngester(stream_source, binance_service.quote_table)
+
 # WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+manager = ConnectionManager(queue_size=config.WS_SEND_QUEUE_SIZE, send_timeout=config.WS_SEND_TIMEOUT)
+market_data_hub = MarketDataHub(manager, binance_service, symbols=config.TRACKED_SYMBOLS, ingester=stream_ingester)
+metrics.gauge("ws_connected_clients", "Connected /ws/prices clients", lambda: len(manager.clients))
+# With several workers, each writes its scrape-time gauges for the aggregated /metrics
+gauge_refresher = metrics.GaugeRefresher(interval=config.METRICS_GAUGE_INTERVAL)
+
+# Periodic portfolio valuation snapshots behind /portfolio/{id}/history
+valuation_recorder = None
+if config.VALUATION_SNAPSHOT_INTERVAL > 0:
+    valuation_recorder = ValuationRecorder(
+        binance_service,
+        async_engine,
+        interval=config.VALUATION_SNAPSHOT_INTERVAL,
+        max_concurrency=config.VALUATION_MAX_CONCURRENCY,
+        timeout=config.VALUATION_TIMEOUT,
+    )
+
+# Local order books for the tracked coins; other coins get one-off REST snapshots
+order_book_mirror = OrderBookMirror(
+    binance_service,
+    config.BINANCE_DEPTH_STREAM_URL,
+    depth=config.ORDER_BOOK_DEPTH,
+    fallback_depth=config.ORDER_BOOK_FALLBACK_DEPTH,
+)
+metrics.gauge("orderbook_stream_connected", "1 while the order-book depth stream is connected", lambda: float(order_book_mirror.connected))
+metrics.gauge("orderbook_books_synced", "Mirrored order books currently in sync", lambda: order_book_mirror.stats()["synced"])
+metrics.gauge("orderbook_resyncs", "REST snapshots loaded to resync mirrored books", lambda: order_book_mirror.resyncs)
+metrics.gauge("orderbook_gaps", "Sequence gaps seen on the depth stream", lambda: order_book_mirror.gaps)
+metrics.gauge("orderbook_update_lag_seconds", "Seconds since the stalest synced book last changed", lambda: order_book_mirror.stats()["update_lag_seconds"] or 0.0)
+
+def start_producer():
+    """Start the jobs that must run in exactly one worker"""
+    if stream_ingester is not None:
+        stream_ingester.start()
+    market_data_hub.start()
+    if valuation_recorder is not None:
+        valuation_recorder.start()
+
+# With several workers, one elected producer polls Binance and the rest follow it
+price_bus = None
+if config.PRICE_BUS_PORT:
+    price_bus = PriceBus(market_data_hub, config.PRICE_BUS_PORT, on_elected=start_producer)
+
+async def startup():
+    # Schema checks run here rather than at import time, off the event loop
+    await asyncio.get_running_loop().run_in_executor(None, run_migrations, engine)
+    await binance_service.start()
+    try:
+        await symbol_registry.load()
+        market_data_hub.symbols = symbol_registry.filter(config.TRACKED_SYMBOLS)
+    except Exception as e:
+        logger.warning("Error loading exchangeInfo, assuming USDT pairs: %s", e)
+    symbol_registry.start()
+    gauge_refresher.start()
+    # Every worker answers liquidity queries, so each keeps its own mirror
+    if config.ORDER_BOOK_ENABLED and config.STREAM_ENABLED and not config.STREAM_REPLAY_FILE:
+        order_book_mirror.symbols = market_data_hub.symbols
+        order_book_mirror.start()
+    if price_bus is None:
+        start_producer()
+    else:
+        price_bus.start()
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+async def shutdown():
+    if price_bus is not None:
+        await price_bus.stop()
+    if valuation_recorder is not None:
+        await valuation_recorder.stop()
+    await market_data_hub.stop()
+    await order_book_mirror.stop()
+    await symbol_registry.stop()
+    if stream_ingester is not None:
+        await stream_ingester.stop()
+    await binance_service.close()
+    forecast_engine.shutdown()
+    await gauge_refresher.stop()
+    metrics.mark_process_dead()
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    yield
+    await shutdown()
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+app = FastAPI(title="Crypto Portfolio Tracker API", lifespan=lifespan, default_response_class=ResponseClass)
 
-manager = ConnectionManager()
+# Configure CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:5173"],  # Frontend Vite default port
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (e.g. /price/{coin_id}) so coin ids don't each get a series
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, route.path if route is not None else "unmatched", status
+        ).observe(time.perf_counter() - started)
 
 # WebSocket endpoint for real-time price updates
+#
+# mode=full (default): every refresh as one JSON frame with all tracked pairs.
+# mode=delta: a snapshot, then only changed symbols; accepts symbols=BTC,ETH,
+# max_rate=<frames per second> and encoding=json|compact|msgpack, and the client
+# may send {"op": "subscribe"|"unsubscribe", "symbols": [...]} at any time.
 @app.websocket("/ws/prices")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    mode: str = "full",
+    symbols: Optional[str] = None,
+    max_rate: float = 1.0,
+    encoding: str = "json",
+):
+    subscription = None
+    if mode == "delta":
+        try:
+            symbol_filter = {s.strip().upper() for s in symbols.split(",") if s.strip()} if symbols else None
+            subscription = PriceSubscription(symbol_filter, max_rate, encoding)
+        except ValueError as e:
+            logger.info("Rejecting WebSocket subscription: %s", e)
+            await websocket.close(code=1008)
+            return
+    elif mode != "full":
+        await websocket.close(code=1008)
+        return
+
+    # The client's writer starts with the latest snapshot; the hub pushes every refresh after that
+    snapshot = market_data_hub.frame if subscription is None else market_data_hub.prices
+    await manager.connect(websocket, subscription, snapshot)
     try:
         while True:
-            # Get real-time prices and 24h changes from Binance
-            prices = await BinanceService.get_all_prices()
-            price_data = {}
-            
-            # List of valid trading pairs we want to track
-            valid_pairs = ['BTC', 'ETH', 'BNB', 'SOL', 'ADA', 'DOT', 'AVAX', 'MATIC', 'LINK', 'UNI']
-            
-            for symbol in valid_pairs:
-                try:
-                    price = await BinanceService.get_current_price(symbol)
-                    change_24h = await BinanceService.get_24h_change(symbol)
-                    
-                    if price and change_24h:
-                        price_data[symbol] = {
-                            "price": price["price"],
-                            "change_24h": change_24h["priceChangePercent"],
-                            "price_change": change_24h["priceChange"],
-                            "last_price": change_24h["lastPrice"]
-                        }
-                except Exception as e:
-                    print(f"Error getting data for {symbol}: {str(e)}")
-                    continue
-            
-            data = {
-                "timestamp": datetime.now().isoformat(),
-                "prices": price_data
-            }
-            await websocket.send_text(json.dumps(data))
-            await asyncio.sleep(1)  # Update every second
+            message = await websocket.receive_text()
+            if subscription is None:
+                continue
+            try:
+                request = json.loads(message)
+                if request.get("op") == "subscribe":
+                    subscription.subscribe(request.get("symbols", []), market_data_hub.prices)
+                elif request.get("op") == "unsubscribe":
+                    subscription.unsubscribe(request.get("symbols", []), market_data_hub.symbols)
+            except (ValueError, AttributeError, TypeError):
+                continue
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"Error in WebSocket: {str(e)}")
+        logger.warning("Error in WebSocket: %s", e)
         manager.disconnect(websocket)
 
 # Basic health check endpoint
@@ -108,24 +361,66 @@ async def websocket_endpoint(websocket: WebSocket):
 async def root():
     return {"status": "healthy", "message": "Crypto Portfolio Tracker API is running"}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return quote_cache.stats()
+
+@app.get("/ws/stats")
+async def websocket_stats():
+    stats = manager.stats()
+    if price_bus is not None:
+        stats["price_bus"] = price_bus.stats()
+    return stats
+
+@app.get("/stream/status")
+async def stream_status():
+    if stream_ingester is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "connected": stream_ingester.connected,
+        "frames_received": stream_ingester.frames_received,
+        "reconnects": stream_ingester.reconnects,
+        "quotes": len(stream_ingester.table),
+    }
+
+@app.get("/orderbook/status")
+async def order_book_status():
+    return order_book_mirror.stats()
+
+@app.get("/upstream/status")
+async def upstream_status(binance: BinanceService = Depends(get_binance_service)):
+    return dict(
+        binance.governor.stats(),
+        last_good_entries=len(binance.last_good),
+        last_good_served=binance.last_good.served,
+    )
+
 @app.get("/test-db")
-async def test_database(db: Session = Depends(get_db)):
+async def test_database(db: AsyncSession = Depends(get_async_db)):
     try:
         # Test database connection
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {"status": "Database connection successful"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
 
 # Portfolio endpoints
 @app.post("/portfolio/manual")
-async def add_coin_manually(coin: CoinManual):
+async def add_coin_manually(coin: CoinManual, binance: BinanceService = Depends(get_binance_service)):
     try:
-        print(f"Received coin data: {coin.dict()}")  # Debug log
+        logger.debug("Received coin data: %s", coin)
+        if binance.route(coin.symbol) is None:
+            raise ValueError(f"Unknown symbol: {coin.symbol}")
         
         # Get current price from Binance
-        current_price = await BinanceService.get_current_price(coin.symbol)
-        print(f"Current price for {coin.symbol}: {current_price}")  # Debug log
+        prices = await binance.get_prices([coin.symbol])
+        current_price = prices.get(coin.symbol, {"symbol": coin.symbol, "price": 0})
+        logger.debug("Current price for %s: %s", coin.symbol, current_price)
         
         return {
             "message": "Coin added successfully",
@@ -133,7 +428,7 @@ async def add_coin_manually(coin: CoinManual):
             "current_price": current_price
         }
     except Exception as e:
-        print(f"Error in add_coin_manually: {str(e)}")  # Debug log
+        logger.info("Error in add_coin_manually: %s", e)
         raise HTTPException(status_code=400, detail=f"Failed to add coin: {str(e)}")
 
 @app.get("/portfolio/address/{wallet}")
@@ -148,161 +443,310 @@ async def sync_wallet(wallet: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/price/{coin_id}")
-async def get_coin_price(coin_id: str):
+@app.get("/price/{coin_id}", response_model=PriceOut)
+async def get_coin_price(coin_id: str, binance: BinanceService = Depends(get_binance_service)):
     try:
-        print(f"Fetching price for coin: {coin_id}")  # Debug log
+        logger.debug("Fetching price for coin: %s", coin_id)
+        if binance.route(coin_id) is None:
+            raise ValueError(f"Unknown symbol: {coin_id}")
         
-        price_data = await BinanceService.get_current_price(coin_id)
-        change_24h = await BinanceService.get_24h_change(coin_id)
+        prices, changes = await asyncio.gather(
+            binance.get_prices([coin_id]),
+            binance.get_24h_changes([coin_id]),
+        )
+        price_data = prices.get(coin_id, {})
+        change_24h = changes.get(coin_id, {})
         
-        print(f"Price data: {price_data}")  # Debug log
-        print(f"24h change: {change_24h}")  # Debug log
+        logger.debug("Price data for %s: %s, 24h change: %s", coin_id, price_data, change_24h)
         
         return {
             "symbol": coin_id,
-            "price": price_data["price"],
-            "change_24h": change_24h["priceChangePercent"],
-            "price_change": change_24h["priceChange"],
-            "last_price": change_24h["lastPrice"]
+            "price": price_data.get("price", 0),
+            "change_24h": change_24h.get("priceChangePercent", 0),
+            "price_change": change_24h.get("priceChange", 0),
+            "last_price": change_24h.get("lastPrice", 0)
         }
     except Exception as e:
-        print(f"Error in get_coin_price for {coin_id}: {str(e)}")  # Debug log
+        logger.info("Error in get_coin_price for %s: %s", coin_id, e)
         raise HTTPException(status_code=400, detail=f"Failed to fetch price for {coin_id}: {str(e)}")
 
+@app.get("/orderbook/{coin_id}")
+async def get_order_book(coin_id: str, levels: int = 10, binance: BinanceService = Depends(get_binance_service)):
+    try:
+        book = await order_book_mirror.book(coin_id, binance)
+        mirrored = book is order_book_mirror.books.get(coin_id.upper())
+        return dict(book.summary(levels), symbol=coin_id.upper(), mirrored=mirrored)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/orderbook/{coin_id}/slippage")
+async def get_slippage(
+    coin_id: str,
+    quantity: float,
+    side: str = "sell",
+    binance: BinanceService = Depends(get_binance_service),
+):
+    try:
+        book = await order_book_mirror.book(coin_id, binance)
+        return dict(book.estimate(side, quantity), symbol=coin_id.upper())
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/forecast/{coin_id}")
-async def get_coin_forecast(coin_id: str):
+async def get_coin_forecast(
+    coin_id: str,
+    lookback: int = Query(30, ge=2, le=1000),
+    interval: str = "1d",
+    model: str = config.FORECAST_DEFAULT_MODEL,
+    binance: BinanceService = Depends(get_binance_service),
+):
     try:
-        forecast = await BinanceService.get_7day_forecast(coin_id)
+        forecast = await forecast_engine.forecast(coin_id, model, interval, lookback, binance)
         return forecast
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/compare/{user_id}")
-async def compare_portfolio(user_id: str):
+@app.post("/forecast/batch")
+async def get_batch_forecast(request: ForecastBatch, binance: BinanceService = Depends(get_binance_service)):
     try:
-        # Get all current prices
-        all_prices = await BinanceService.get_all_prices()
-        # Here you would implement portfolio comparison logic
+        symbols = [symbol.strip().upper() for symbol in request.symbols if symbol.strip()]
+        if not symbols:
+            raise ValueError("symbols must not be empty")
+        forecasts, errors = await forecast_engine.forecast_many(
+            symbols, request.model, request.interval, request.lookback, binance
+        )
+        return {"model": request.model, "forecasts": forecasts, "errors": errors}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/compare/{user_id}", response_model=PortfolioComparison, response_model_exclude_unset=True)
+async def compare_portfolio(
+    user_id: int,
+    interval: str = "1d",
+    lookback: int = Query(90, ge=2, le=1000),
+    confidence: float = 0.95,
+    db: AsyncSession = Depends(get_async_db),
+    binance: BinanceService = Depends(get_binance_service),
+):
+    try:
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        rows = (await db.execute(
+            select(Portfolio.id, Portfolio.name, Holding.coin_id, Holding.amount)
+            .join(Holding, Holding.portfolio_id == Portfolio.id)
+            .where(Portfolio.user_id == user_id)
+        )).all()
+        if not rows:
+            return {"message": f"No holdings found for user {user_id}", "portfolios": []}
+        
+        # pandas is only imported once the first comparison needs it
+        from services import portfolio_analytics as analytics
+        amounts, names = analytics.holdings_matrix(rows)
+        
+        closes = await analytics.load_close_matrix(binance, list(amounts.columns), interval, lookback)
+        if len(closes) < 3:
+            raise ValueError("Not enough aligned price history for these holdings")
+        weights = analytics.value_weights(amounts, closes.iloc[-1])
+        
+        # One batched NumPy/pandas pass for every portfolio, off the event loop
+        results, covariance, correlation = await asyncio.get_running_loop().run_in_executor(
+            None, partial(analytics.analyze_portfolios, closes, weights, confidence, periods=analytics.periods_per_year(interval))
+        )
+        
+        portfolios = []
+        for portfolio_id, row in results.iterrows():
+            held = weights.loc[portfolio_id]
+            portfolios.append({
+                "portfolio_id": int(portfolio_id),
+                "portfolio_name": names[portfolio_id],
+                "weights": {symbol: round(weight, 4) for symbol, weight in held[held > 0].items()},
+                "analysis": {name: round(float(value), 4) for name, value in row.items()}
+            })
+        
         return {
             "message": f"Portfolio comparison for user {user_id}",
-            "market_data": all_prices
+            "interval": interval,
+            "candles": len(closes),
+            "confidence": confidence,
+            "unpriced": [symbol for symbol in amounts.columns if symbol not in closes.columns],
+            "portfolios": portfolios,
+            "covariance": covariance.round(8).to_dict(),
+            "correlation": correlation.round(4).to_dict()
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # Database endpoints for portfolio management
 @app.post("/portfolio/save")
-async def save_portfolio(portfolio_data: PortfolioSave, db: Session = Depends(get_db)):
+async def save_portfolio(portfolio_data: PortfolioSave, db: AsyncSession = Depends(get_async_db)):
     try:
-        print(f"Received portfolio data: {portfolio_data.dict()}")  # Debug log
-        
-        # Check if user exists, create if not
-        user = db.query(User).filter(User.id == portfolio_data.user_id).first()
-        if not user:
-            user = User(id=portfolio_data.user_id, email=f"user{portfolio_data.user_id}@example.com", username=f"user{portfolio_data.user_id}")
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        
-        # Check if portfolio exists, create if not
-        portfolio = db.query(Portfolio).filter(
-            Portfolio.user_id == portfolio_data.user_id,
-            Portfolio.name == portfolio_data.portfolio_name
-        ).first()
+        result = await db.run_sync(
+            save_portfolio_holdings,
+            portfolio_data.user_id,
+            portfolio_data.portfolio_name,
+            portfolio_data.holdings,
+        )
+        logger.debug("Portfolio saved with %d holdings: %s", len(portfolio_data.holdings), result)
         
+        return {
+            "message": "Portfolio saved successfully",
+            "portfolio_id": result["portfolio_id"],
+            "holdings_count": len(portfolio_data.holdings),
+            "inserted": result["inserted"],
+            "updated": result["updated"],
+            "deleted": result["deleted"],
+            "unchanged": result["unchanged"]
+        }
+    except Exception as e:
+        await db.rollback()
+        logger.warning("Error saving portfolio: %s", e)
+        raise HTTPException(status_code=400, detail=f"Failed to save portfolio: {str(e)}")
+
+# Streaming bulk import: CSV (with a symbol,amount,... header) or NDJSON as the raw request body
+@app.post("/portfolio/import")
+async def import_portfolio(
+    request: Request,
+    user_id: int = 1,
+    portfolio_name: str = "My Portfolio",
+    format: Optional[str] = None,
+    mode: str = "append",
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        if mode not in ("append", "replace"):
+            raise ValueError("mode must be 'append' or 'replace'")
+        fmt = detect_format(format, request.headers.get("content-type"))
+        result = await import_holdings(
+            db,
+            request.stream(),
+            user_id,
+            portfolio_name,
+            fmt,
+            replace=mode == "replace",
+            batch_size=config.HOLDINGS_BATCH_SIZE,
+        )
+        logger.info("Imported %d holdings into portfolio %d (%d invalid rows)", result["imported"], result["portfolio_id"], result["invalid"])
+        return dict(result, message="Holdings imported")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to import holdings: {str(e)}")
+
+@app.get("/portfolio/{portfolio_id}/export")
+async def export_portfolio(portfolio_id: int, format: str = "csv", db: AsyncSession = Depends(get_async_db)):
+    try:
+        fmt = detect_format(format, None)
+        portfolio = await db.get(Portfolio, portfolio_id)
         if not portfolio:
-            portfolio = Portfolio(
-                user_id=portfolio_data.user_id,
-                name=portfolio_data.portfolio_name
-            )
-            db.add(portfolio)
-            db.commit()
-            db.refresh(portfolio)
-        
-        # Clear existing holdings for this portfolio
-        db.query(Holding).filter(Holding.portfolio_id == portfolio.id).delete()
-        
-        # Add new holdings
-        for holding_data in portfolio_data.holdings:
-            try:
-                print(f"Processing holding: {holding_data}")  # Debug log
-                
-                # Handle purchase_date more safely
-                purchase_date = datetime.now()
-                if "purchase_date" in holding_data and holding_data["purchase_date"]:
-                    try:
-                        if isinstance(holding_data["purchase_date"], str):
-                            purchase_date = datetime.strptime(holding_data["purchase_date"], "%Y-%m-%d")
-                        else:
-                            purchase_date = datetime.now()
-                    except ValueError:
-                        purchase_date = datetime.now()
-                
-                holding = Holding(
-                    portfolio_id=portfolio.id,
-                    coin_id=holding_data["symbol"],
-                    amount=float(holding_data["amount"]),
-                    purchase_price=float(holding_data.get("purchase_price", 0)),
-                    purchase_date=purchase_date
-                )
-                db.add(holding)
-                print(f"Added holding: {holding.coin_id} - {holding.amount}")  # Debug log
-            except Exception as e:
-                print(f"Error processing holding {holding_data}: {str(e)}")  # Debug log
-                raise e
+            raise ValueError(f"Portfolio {portfolio_id} not found")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to export holdings: {str(e)}")
+    
+    # The generator opens its own session, which lives as long as the response streams
+    return StreamingResponse(
+        export_holdings(AsyncSessionLocal, portfolio_id, fmt, batch_size=config.HOLDINGS_BATCH_SIZE),
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="portfolio-{portfolio_id}.{fmt}"'},
+    )
+
+@app.get("/portfolio/{portfolio_id}/history", response_model=PortfolioHistory, response_model_exclude_unset=True)
+async def get_portfolio_history(
+    portfolio_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = 200,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        if not 1 <= points <= 2000:
+            raise ValueError("points must be between 1 and 2000")
+        portfolio = await db.get(Portfolio, portfolio_id)
+        if not portfolio:
+            return {"message": "No portfolio found", "history": []}
         
-        db.commit()
-        print(f"Portfolio saved successfully with {len(portfolio_data.holdings)} holdings")  # Debug log
+        # Defaults to the last 30 days; naive datetimes are UTC, like the rest of the API
+        end = end or datetime.utcnow()
+        start = start or end - timedelta(days=30)
+        start_ms, end_ms = (
+            int((t if t.tzinfo else t.replace(tzinfo=timezone.utc)).timestamp() * 1000) for t in (start, end)
+        )
+        if start_ms >= end_ms:
+            raise ValueError("start must be before end")
+        result = await load_history(db, portfolio_id, start_ms, end_ms, points)
         
         return {
-            "message": "Portfolio saved successfully",
             "portfolio_id": portfolio.id,
-            "holdings_count": len(portfolio_data.holdings)
+            "portfolio_name": portfolio.name,
+            "bucket_ms": result["bucket_ms"],
+            "history": result["history"]
         }
     except Exception as e:
-        db.rollback()
-        print(f"Error saving portfolio: {str(e)}")  # Debug log
-        raise HTTPException(status_code=400, detail=f"Failed to save portfolio: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Failed to get portfolio history: {str(e)}")
 
-@app.get("/portfolio/{user_id}")
-async def get_portfolio(user_id: int, db: Session = Depends(get_db)):
+@app.get("/portfolio/{portfolio_id}/liquidation")
+async def get_portfolio_liquidation(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    binance: BinanceService = Depends(get_binance_service),
+):
     try:
-        portfolio = db.query(Portfolio).filter(Portfolio.user_id == user_id).first()
+        rows = (await db.execute(
+            select(Holding.coin_id, func.sum(Holding.amount))
+            .where(Holding.portfolio_id == portfolio_id)
+            .group_by(Holding.coin_id)
+        )).all()
+        if not rows:
+            raise ValueError(f"No holdings found for portfolio {portfolio_id}")
+        
+        # Sell every holding at its full size into the current bids
+        result = await estimate_liquidation(
+            order_book_mirror, {symbol: amount for symbol, amount in rows if amount > 0}, binance
+        )
+        return dict(result, portfolio_id=portfolio_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to estimate liquidation: {str(e)}")
+
+@app.get("/portfolio/{user_id}", response_model=PortfolioOut, response_model_exclude_unset=True)
+async def get_portfolio(
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    binance: BinanceService = Depends(get_binance_service),
+):
+    try:
+        # Portfolio and holdings in one round trip
+        portfolio = (await db.execute(
+            select(Portfolio)
+            .options(joinedload(Portfolio.holdings))
+            .where(Portfolio.user_id == user_id)
+            .order_by(Portfolio.id)
+            .limit(1)
+        )).unique().scalars().first()
         if not portfolio:
             return {"message": "No portfolio found", "holdings": []}
         
-        holdings = db.query(Holding).filter(Holding.portfolio_id == portfolio.id).all()
+        holdings = portfolio.holdings
+        
+        # One batch request per ticker endpoint, however many holdings there are;
+        # symbols the batch couldn't quote are valued concurrently, each with its own timeout
+        symbols = [holding.coin_id for holding in holdings]
+        prices, changes = await binance.get_quotes(
+            symbols,
+            max_concurrency=config.VALUATION_MAX_CONCURRENCY,
+            timeout=config.VALUATION_TIMEOUT,
+        )
         
         holdings_data = []
         for holding in holdings:
-            # Get current price from Binance
-            try:
-                current_price = await BinanceService.get_current_price(holding.coin_id)
-                change_24h = await BinanceService.get_24h_change(holding.coin_id)
-                
-                holdings_data.append({
-                    "id": holding.id,
-                    "symbol": holding.coin_id,
-                    "amount": holding.amount,
-                    "purchase_price": holding.purchase_price,
-                    "purchase_date": holding.purchase_date.isoformat() if holding.purchase_date else None,
-                    "current_price": current_price["price"] if current_price else 0,
-                    "change24h": change_24h["priceChangePercent"] if change_24h else 0,
-                    "value": holding.amount * (current_price["price"] if current_price else 0)
-                })
-            except Exception as e:
-                print(f"Error fetching price for {holding.coin_id}: {str(e)}")
-                holdings_data.append({
-                    "id": holding.id,
-                    "symbol": holding.coin_id,
-                    "amount": holding.amount,
-                    "purchase_price": holding.purchase_price,
-                    "purchase_date": holding.purchase_date.isoformat() if holding.purchase_date else None,
-                    "current_price": 0,
-                    "change24h": 0,
-                    "value": 0
-                })
+            current_price = prices.get(holding.coin_id)
+            change_24h = changes.get(holding.coin_id)
+            holdings_data.append({
+                "id": holding.id,
+                "symbol": holding.coin_id,
+                "amount": holding.amount,
+                "purchase_price": holding.purchase_price,
+                "purchase_date": holding.purchase_date.isoformat() if holding.purchase_date else None,
+                "current_price": current_price["price"] if current_price else 0,
+                "change24h": change_24h["priceChangePercent"] if change_24h else 0,
+                "value": holding.amount * (current_price["price"] if current_price else 0)
+            })
         
         return {
             "portfolio_id": portfolio.id,
@@ -313,4 +757,12 @@ async def get_portfolio(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=f"Failed to get portfolio: {str(e)}")
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    if config.WORKERS > 1:
+        # Workers re-import this module; share one producer unless a port was chosen
+        os.environ.setdefault("PRICE_BUS_PORT", "8765")
+        # Workers write their metrics to files here, so /metrics covers all of them whichever
+        # worker answers the scrape; a fresh directory so no stale series are picked up
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="prometheus-"))
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=config.WORKERS)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Index, JSON, Table
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -25,13 +25,18 @@ class Portfolio(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="portfolios")
-    holdings = relationship("Holding", back_populates="portfolio")
+    holdings = relationship("Holding", back_populates="portfolio", order_by="Holding.id")
+
+    # Unique index rather than a table constraint so it can be added to existing SQLite tables
+    __table_args__ = (
+        Index("uq_portfolios_user_id_name", "user_id", "name", unique=True),
+    )
 
 class Holding(Base):
     __tablename__ = "holdings"
 
     id = Column(Integer, primary_key=True, index=True)
-    portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), index=True)
     coin_id = Column(String)  # e.g., "BTC", "ETH"
     amount = Column(Float)
     purchase_price = Column(Float)
@@ -49,4 +54,36 @@ class PriceHistory(Base):
     price = Column(Float)
     timestamp = Column(DateTime, default=datetime.utcnow)
     volume = Column(Float)
-    market_cap = Column(Float) 
\ No newline at end of file
+    market_cap = Column(Float)
+
+    __table_args__ = (
+        Index("ix_price_history_coin_id_timestamp", "coin_id", "timestamp"),
+    )
+
+class Candle(Base):
+    __tablename__ = "candles"
+
+    # Composite primary key doubles as the (symbol, interval, open_time) index
+    symbol = Column(String, primary_key=True)  # coin id, e.g. "BTC" (not the trading pair)
+    interval = Column(String, primary_key=True)  # e.g., "1d"
+    open_time = Column(BigInteger, primary_key=True)  # ms since epoch
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(Float)
+    close_time = Column(BigInteger)
+
+class PortfolioValuation(Base):
+    __tablename__ = "portfolio_valuations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
+    timestamp = Column(BigInteger)  # ms since epoch, so range bucketing is plain integer math
+    total_value = Column(Float)
+    cost_basis = Column(Float)
+    coin_values = Column(JSON)  # e.g., {"BTC": 30000.0, "ETH": 6000.0}
+
+    __table_args__ = (
+        Index("ix_portfolio_valuations_portfolio_id_timestamp", "portfolio_id", "timestamp"),
+    )
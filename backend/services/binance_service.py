@@ -1,68 +1,234 @@
 import aiohttp
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from services.quote_cache import QuoteCache, klines_ttl
+from services.rate_governor import LastKnownGood, UpstreamUnavailable, request_weight
+from services.symbol_registry import Route
+from utils.metrics import UPSTREAM_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def _usd_price(data: Dict, cross: Optional[Dict] = None) -> float:
+    """Dollar price from a /ticker/price record, through the cross pair when there is one"""
+    price = float(data.get("price", 0))
+    return price * float(cross.get("price", 0)) if cross else price
+
+
+def _usd_change(data: Dict, cross: Optional[Dict] = None) -> Dict:
+    """Dollar 24h stats from a /ticker/24hr record; cross rates compound both pairs' changes"""
+    percent = float(data.get("priceChangePercent", 0))
+    last_price = float(data.get("lastPrice", 0))
+    if not cross:
+        return {
+            "priceChangePercent": percent,
+            "priceChange": float(data.get("priceChange", 0)),
+            "lastPrice": last_price
+        }
+    percent = ((1 + percent / 100) * (1 + float(cross.get("priceChangePercent", 0)) / 100) - 1) * 100
+    last_price *= float(cross.get("lastPrice", 0))
+    return {
+        "priceChangePercent": percent,
+        "priceChange": last_price - last_price / (1 + percent / 100),
+        "lastPrice": last_price
+    }
+
+
+def _usd_klines(klines: List[List], cross_klines: List[List]) -> List[List]:
+    """Convert klines quoted in BTC to dollars using the BTC candle with the same open time"""
+    rates = {kline[0]: float(kline[4]) for kline in cross_klines}
+    converted = []
+    for kline in klines:
+        rate = rates.get(kline[0])
+        if rate is not None:
+            converted.append([kline[0]] + [float(value) * rate for value in kline[1:5]] + list(kline[5:]))
+    return converted
+
 
 class BinanceService:
     BASE_URL = "https://api.binance.com/api/v3"
-    
-    @staticmethod
-    async def get_current_price(symbol: str) -> Dict:
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+        cache: Optional[QuoteCache] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.cache = cache
+        # Optional CandleStore serving klines from the local database
+        self.candle_store = None
+        # Optional QuoteTable fed by the upstream stream; REST is the fallback
+        self.quote_table = None
+        # Optional SymbolRegistry choosing the pair for each coin
+        self.registry = None
+        # Optional RateGovernor; last good responses are served while it refuses requests
+        self.governor = None
+        self.last_good = LastKnownGood()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Open the shared connection pool"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        """Close the shared connection pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("BinanceService is not started")
+        return self._session
+
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET a Binance REST path and return the decoded JSON body.
+
+        With a governor attached, the request is charged against the weight
+        budget first; while the governor refuses requests (breaker open or
+        budget exhausted) the last good response for the same call is returned
+        if there is one.
+        """
+        key = (path, tuple(sorted((params or {}).items())))
+        if self.governor is None:
+            return await self._request(path, params)
+        try:
+            await self.governor.acquire(path, request_weight(path, params))
+        except UpstreamUnavailable:
+            fallback = self.last_good.get(key)
+            if fallback is None:
+                raise
+            return fallback
+        try:
+            data = await self._request(path, params)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not isinstance(e, aiohttp.ClientResponseError):
+                # Connection errors and timeouts never reached observe()
+                self.governor.record_failure()
+            fallback = self.last_good.get(key) if self.governor.is_open else None
+            if fallback is None:
+                raise
+            return fallback
+        except BaseException:
+            self.governor.abandon()
+            raise
+        self.last_good.put(key, data)
+        return data
+
+    async def _request(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with self.session.get(f"{self.base_url}{path}", params=params) as response:
+                status = response.status
+                if self.governor is not None:
+                    self.governor.observe(response.status, response.headers)
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise aiohttp.ClientResponseError(
+                        response.request_info,
+                        response.history,
+                        status=response.status,
+                        message=error_text,
+                    )
+                return await response.json()
+        finally:
+            UPSTREAM_REQUEST_SECONDS.labels(path, status).observe(time.perf_counter() - started)
+
+    async def _cached(
+        self,
+        kind: str,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Serve a single upstream lookup through the quote cache when one is configured"""
+        if self.cache is None:
+            return await loader()
+        return await self.cache.get(kind, key, loader, ttl)
+
+    async def _get_ticker(self, kind: str, path: str, pair: str) -> Optional[Dict]:
+        """Look up one pair's ticker, preferring a fresh streamed quote over REST"""
+        if self.quote_table is not None:
+            quote = self.quote_table.get(pair)
+            if quote is not None:
+                return quote
+        return await self._cached(kind, pair, lambda: self._get(path, {"symbol": pair}))
+
+    def route(self, symbol: str) -> Optional[Route]:
+        """Pair(s) that price ``symbol`` in dollars; None when the registry knows it doesn't trade"""
+        if self.registry is None or not self.registry.loaded:
+            # No exchangeInfo yet: assume a USDT pair and let Binance reject unknown coins
+            return Route(f"{symbol}USDT", "USDT")
+        return self.registry.route(symbol)
+
+    def _route_or_raise(self, symbol: str) -> Route:
+        route = self.route(symbol)
+        if route is None:
+            raise ValueError(f"Unknown symbol: {symbol}")
+        return route
+
+    async def get_current_price(self, symbol: str) -> Dict:
         """Get current price for a symbol"""
         try:
-            # Ensure symbol is in correct format for Binance (e.g., BTCUSDT)
-            formatted_symbol = f"{symbol}USDT"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{BinanceService.BASE_URL}/ticker/price", params={"symbol": formatted_symbol}) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        print(f"Error response from Binance for {formatted_symbol}: {error_text}")
-                        return {
-                            "symbol": symbol,
-                            "price": 0
-                        }
-                    
-                    data = await response.json()
-                    return {
-                        "symbol": symbol,
-                        "price": float(data.get("price", 0))
-                    }
+            route = self._route_or_raise(symbol)
+            pairs = [route.pair] + ([route.cross] if route.cross else [])
+            tickers = await asyncio.gather(*(self._get_ticker("price", "/ticker/price", pair) for pair in pairs))
+            if any(data is None for data in tickers):
+                # Cached as unknown by an earlier batch lookup
+                raise ValueError(f"No ticker for {route.pair}")
+            return {
+                "symbol": symbol,
+                "price": _usd_price(*tickers)
+            }
         except Exception as e:
-            print(f"Error getting price for {symbol}: {str(e)}")
+            logger.warning("Error getting price for %s: %s", symbol, e)
             return {
                 "symbol": symbol,
                 "price": 0
             }
 
-    @staticmethod
-    async def get_24h_change(symbol: str) -> Dict:
+    async def get_24h_change(self, symbol: str) -> Dict:
         """Get 24-hour price change statistics"""
         try:
-            # Ensure symbol is in correct format for Binance (e.g., BTCUSDT)
-            formatted_symbol = f"{symbol}USDT"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{BinanceService.BASE_URL}/ticker/24hr", params={"symbol": formatted_symbol}) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        print(f"Error response from Binance for {formatted_symbol}: {error_text}")
-                        return {
-                            "symbol": symbol,
-                            "priceChangePercent": 0,
-                            "priceChange": 0,
-                            "lastPrice": 0
-                        }
-                    
-                    data = await response.json()
-                    return {
-                        "symbol": symbol,
-                        "priceChangePercent": float(data.get("priceChangePercent", 0)),
-                        "priceChange": float(data.get("priceChange", 0)),
-                        "lastPrice": float(data.get("lastPrice", 0))
-                    }
+            route = self._route_or_raise(symbol)
+            pairs = [route.pair] + ([route.cross] if route.cross else [])
+            tickers = await asyncio.gather(*(self._get_ticker("24hr", "/ticker/24hr", pair) for pair in pairs))
+            if any(data is None for data in tickers):
+                # Cached as unknown by an earlier batch lookup
+                raise ValueError(f"No ticker for {route.pair}")
+            return dict(_usd_change(*tickers), symbol=symbol)
         except Exception as e:
-            print(f"Error getting 24h change for {symbol}: {str(e)}")
+            logger.warning("Error getting 24h change for %s: %s", symbol, e)
             return {
                 "symbol": symbol,
                 "priceChangePercent": 0,
@@ -70,128 +236,210 @@ class BinanceService:
                 "lastPrice": 0
             }
 
-    @staticmethod
-    async def get_historical_prices(symbol: str, interval: str = "1d", limit: int = 30) -> List:
-        """Get historical klines/candlestick data"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{BinanceService.BASE_URL}/klines",
-                params={
-                    "symbol": f"{symbol}USDT",
-                    "interval": interval,
-                    "limit": limit
-                }
-            ) as response:
-                return await response.json()
+    async def _fetch_tickers(self, path: str, pairs: List[str]) -> Dict[str, Dict]:
+        """Fetch a ticker endpoint for many pairs with one request, keyed by Binance pair"""
+        try:
+            try:
+                data = await self._get(path, {"symbols": json.dumps(pairs, separators=(",", ":"))})
+            except aiohttp.ClientResponseError as e:
+                if e.status != 400:
+                    raise
+                # Binance rejects the whole list if a single pair is unknown, so
+                # fall back to the unfiltered ticker and pick the pairs we need
+                data = await self._get(path)
+        except UpstreamUnavailable as e:
+            data = self._last_good_tickers(path, pairs, e)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if self.governor is None or not self.governor.is_open:
+                raise
+            data = self._last_good_tickers(path, pairs, e)
+        wanted = set(pairs)
+        tickers = {item["symbol"]: item for item in data if item.get("symbol") in wanted}
+        for pair, item in tickers.items():
+            self.last_good.put(self._ticker_key(path, pair), item)
+        return tickers
 
-    @staticmethod
-    async def get_all_prices() -> List:
-        """Get all current prices"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{BinanceService.BASE_URL}/ticker/price") as response:
-                return await response.json()
+    def _last_good_tickers(self, path: str, pairs: List[str], error: Exception) -> List[Dict]:
+        """Rebuild a batch from each pair's last good ticker (batches rarely repeat exactly); raises ``error`` if none"""
+        data = [self.last_good.get(self._ticker_key(path, pair)) for pair in pairs]
+        data = [item for item in data if item is not None]
+        if not data:
+            raise error
+        return data
 
     @staticmethod
-    async def get_order_book(symbol: str, limit: int = 100) -> Dict:
-        """Get order book for a symbol"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{BinanceService.BASE_URL}/depth",
-                params={
-                    "symbol": f"{symbol}USDT",
-                    "limit": limit
-                }
-            ) as response:
-                return await response.json()
+    def _ticker_key(path: str, pair: str) -> Tuple:
+        # Same key _get uses for a single-pair lookup, so either kind of request can serve the other
+        return (path, (("symbol", pair),))
 
-    @staticmethod
-    async def get_7day_forecast(symbol: str) -> Dict:
-        """Get 7-day price forecast based on historical data with enhanced analysis"""
-        # Get historical data for the last 30 days
-        historical_data = await BinanceService.get_historical_prices(symbol, "1d", 30)
-        
-        # Extract closing prices
-        closing_prices = [float(day[4]) for day in historical_data]
-        
-        # Calculate daily changes and volatility
-        daily_changes = []
-        for i in range(1, len(closing_prices)):
-            prev_close = closing_prices[i-1]
-            curr_close = closing_prices[i]
-            daily_change = ((curr_close - prev_close) / prev_close) * 100
-            daily_changes.append(daily_change)
-        
-        # Calculate key metrics
-        avg_daily_change = sum(daily_changes) / len(daily_changes)
-        volatility = (sum((x - avg_daily_change) ** 2 for x in daily_changes) / len(daily_changes)) ** 0.5
-        last_price = closing_prices[-1]
-        
-        # Trend analysis using simple moving averages
-        sma_7 = sum(closing_prices[-7:]) / 7
-        sma_14 = sum(closing_prices[-14:]) / 14
-        trend_strength = ((sma_7 / sma_14) - 1) * 100
-        
-        # Calculate momentum indicators
-        rsi = BinanceService.calculate_rsi(closing_prices)
-        
-        # Generate 7-day forecast with confidence intervals
-        forecast = []
-        current_price = last_price
-        for i in range(7):
-            # Adjust prediction based on trend strength
-            trend_factor = 1 + (trend_strength / 100)
-            predicted_change = avg_daily_change * trend_factor
-            
-            # Calculate confidence intervals
-            confidence_interval = volatility * (i + 1) ** 0.5  # Wider intervals for further predictions
-            
-            current_price = current_price * (1 + (predicted_change / 100))
-            forecast.append({
-                "date": (datetime.now() + timedelta(days=i+1)).strftime("%Y-%m-%d"),
-                "price": round(current_price, 2),
-                "upper_bound": round(current_price * (1 + confidence_interval/100), 2),
-                "lower_bound": round(current_price * (1 - confidence_interval/100), 2)
-            })
-        
-        # Calculate additional market metrics
-        price_range = max(closing_prices) - min(closing_prices)
-        price_range_percent = (price_range / min(closing_prices)) * 100
-        
+    async def _get_tickers(self, kind: str, path: str, pairs: List[str]) -> Dict[str, Dict]:
+        """Look up ticker data for many pairs, only fetching pairs the stream and cache can't serve"""
+        pairs = list(dict.fromkeys(pairs))
+        streamed = {}
+        if self.quote_table is not None:
+            streamed = self.quote_table.get_many(pairs)
+            pairs = [pair for pair in pairs if pair not in streamed]
+        if not pairs:
+            return streamed
+        if self.cache is None:
+            fetched = await self._fetch_tickers(path, pairs)
+        else:
+            fetched = await self.cache.get_many(kind, pairs, lambda missing: self._fetch_tickers(path, missing))
+        return {**streamed, **fetched}
+
+    async def _get_routed_tickers(self, kind: str, path: str, symbols: List[str]) -> Dict[str, Tuple]:
+        """Ticker data per symbol as a (pair ticker, cross ticker or None) tuple; unknown symbols are skipped"""
+        routes = {}
+        for symbol in symbols:
+            route = self.route(symbol)
+            if route is not None:
+                routes[symbol] = route
+        pairs = [pair for route in routes.values() for pair in (route.pair, route.cross) if pair]
+        if not pairs:
+            return {}
+        tickers = await self._get_tickers(kind, path, pairs)
+        found = {}
+        for symbol, route in routes.items():
+            data = tickers.get(route.pair)
+            cross = tickers.get(route.cross) if route.cross else None
+            if data and (cross or not route.cross):
+                found[symbol] = (data, cross)
+        return found
+
+    async def get_prices(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Get current prices for many symbols with a single request"""
+        try:
+            tickers = await self._get_routed_tickers("price", "/ticker/price", symbols)
+        except Exception as e:
+            logger.warning("Error getting prices for %s: %s", symbols, e)
+            return {}
         return {
-            "symbol": symbol,
-            "current_price": last_price,
-            "forecast": forecast,
-            "analysis": {
-                "volatility": round(volatility, 2),
-                "trend_strength": round(trend_strength, 2),
-                "rsi": round(rsi, 2),
-                "price_range_30d": round(price_range_percent, 2),
-                "avg_daily_change": round(avg_daily_change, 2),
-                "confidence_level": "High" if volatility < 2 else "Medium" if volatility < 5 else "Low"
-            }
+            symbol: {"symbol": symbol, "price": _usd_price(*tickers[symbol])}
+            for symbol in symbols if symbol in tickers
         }
 
-    @staticmethod
-    def calculate_rsi(prices: List[float], period: int = 14) -> float:
-        """Calculate Relative Strength Index (RSI)"""
-        if len(prices) < period + 1:
-            return 50.0  # Default value if not enough data
-            
-        # Calculate price changes
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        
-        # Separate gains and losses
-        gains = [d if d > 0 else 0 for d in deltas]
-        losses = [-d if d < 0 else 0 for d in deltas]
-        
-        # Calculate average gains and losses
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
-        if avg_loss == 0:
-            return 100.0
-            
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi 
\ No newline at end of file
+    async def get_24h_changes(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Get 24-hour price change statistics for many symbols with a single request"""
+        try:
+            tickers = await self._get_routed_tickers("24hr", "/ticker/24hr", symbols)
+        except Exception as e:
+            logger.warning("Error getting 24h changes for %s: %s", symbols, e)
+            return {}
+        return {
+            symbol: dict(_usd_change(*tickers[symbol]), symbol=symbol)
+            for symbol in symbols if symbol in tickers
+        }
+
+    async def get_quotes_concurrently(
+        self,
+        symbols: List[str],
+        max_concurrency: int = 10,
+        timeout: float = 3.0,
+    ) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """Get price and 24h stats per symbol, concurrently, when no batch quote is available.
+
+        At most ``max_concurrency`` symbols are in flight at once and each one gets
+        ``timeout`` seconds; symbols that fail or time out are left out of the result.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(symbol: str):
+            async with semaphore:
+                return await asyncio.wait_for(
+                    asyncio.gather(self.get_current_price(symbol), self.get_24h_change(symbol)),
+                    timeout,
+                )
+
+        unique_symbols = list(dict.fromkeys(symbols))
+        results = await asyncio.gather(*(fetch(symbol) for symbol in unique_symbols), return_exceptions=True)
+
+        prices, changes = {}, {}
+        for symbol, result in zip(unique_symbols, results):
+            if isinstance(result, BaseException):
+                logger.warning("Error fetching quote for %s: %r", symbol, result)
+                continue
+            prices[symbol], changes[symbol] = result
+        return prices, changes
+
+    async def get_quotes(
+        self,
+        symbols: List[str],
+        max_concurrency: int = 10,
+        timeout: float = 3.0,
+    ) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """Get price and 24h stats for ``symbols``: one batch request per ticker
+        endpoint, then concurrent per-symbol lookups for routable symbols the batch missed"""
+        prices, changes = await asyncio.gather(self.get_prices(symbols), self.get_24h_changes(symbols))
+        # Symbols with no route were never in the batch and would fail per symbol too
+        missing = [
+            symbol for symbol in symbols
+            if (symbol not in prices or symbol not in changes) and self.route(symbol) is not None
+        ]
+        if missing:
+            fallback_prices, fallback_changes = await self.get_quotes_concurrently(
+                missing, max_concurrency=max_concurrency, timeout=timeout
+            )
+            prices = {**prices, **fallback_prices}
+            changes = {**changes, **fallback_changes}
+        return prices, changes
+
+    async def fetch_klines(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 1000,
+    ) -> List:
+        """Fetch one page of klines between two open times (ms), bypassing caches.
+
+        Coins only quoted against BTC are converted to dollars candle by candle
+        using the matching BTC candles.
+        """
+        route = self._route_or_raise(symbol)
+        params = {
+            "symbol": route.pair,
+            "interval": interval,
+            "limit": limit
+        }
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        if route.cross is None:
+            return await self._get("/klines", params)
+        klines, cross_klines = await asyncio.gather(
+            self._get("/klines", params),
+            self._get("/klines", dict(params, symbol=route.cross)),
+        )
+        return _usd_klines(klines, cross_klines)
+
+    async def get_historical_prices(self, symbol: str, interval: str = "1d", limit: int = 30) -> List:
+        """Get historical klines/candlestick data"""
+        if self.candle_store is not None:
+            return await self.candle_store.get_candles(symbol, interval, limit)
+        return await self._cached(
+            "klines",
+            (symbol, interval, limit),
+            lambda: self.fetch_klines(symbol, interval, limit=limit),
+            ttl=klines_ttl(interval),
+        )
+
+    async def get_all_prices(self) -> List:
+        """Get all current prices"""
+        return await self._get("/ticker/price")
+
+    async def get_order_book(self, symbol: str, limit: int = 100) -> Dict:
+        """Get order book for a symbol's routed pair (quoted in that pair's quote asset)"""
+        pair = self._route_or_raise(symbol).pair
+        return await self._cached(
+            "depth",
+            (pair, limit),
+            lambda: self._get(
+                "/depth",
+                {
+                    "symbol": pair,
+                    "limit": limit
+                }
+            ),
+        )
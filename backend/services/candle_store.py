@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+
+from models.models import Candle
+from services.quote_cache import INTERVAL_SECONDS
+
+# Binance caps /klines pages at 1000 candles
+PAGE_LIMIT = 1000
+# Longest window a lookup may ask for, so one request can't page through years of history
+MAX_WINDOW = 1000
+
+
+class CandleStore:
+    """Persistent OHLCV store that backfills klines incrementally.
+
+    Candles are kept in the ``candles`` table keyed by (symbol, interval,
+    open_time). A lookup only downloads candles newer than the last stored one
+    (plus any older range the window needs that has never been fetched) and
+    then serves the window from the database.
+    """
+
+    def __init__(self, binance, engine, sync_interval: float = 60.0):
+        self.binance = binance
+        self.engine = engine
+        self.sync_interval = sync_interval
+        self._last_sync: Dict[Tuple[str, str], float] = {}
+        # Oldest open_time Binance has for a key, once a backfill came up short
+        self._history_start: Dict[Tuple[str, str], int] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    async def get_candles(self, symbol: str, interval: str = "1d", limit: int = 30) -> List[List]:
+        """Return the latest ``limit`` candles (at most MAX_WINDOW) as Binance-style kline rows"""
+        limit = min(max(limit, 1), MAX_WINDOW)
+        await self.sync(symbol, interval, limit)
+        return await self._run(self._read_window, symbol, interval, limit)
+
+    async def sync(self, symbol: str, interval: str, limit: int):
+        """Download whatever the local store is missing for the latest ``limit`` candles"""
+        limit = min(max(limit, 1), MAX_WINDOW)
+        key = (symbol, interval)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            interval_ms = INTERVAL_SECONDS.get(interval, 60) * 1000
+            now_ms = int(time.time() * 1000)
+            window_start = now_ms // interval_ms * interval_ms - (limit - 1) * interval_ms
+            window_start = max(window_start, self._history_start.get(key, window_start))
+
+            first, last = await self._run(self._bounds, symbol, interval)
+
+            if first is None:
+                fetched = await self._backfill(symbol, interval, window_start, None)
+                if fetched is not None and fetched > window_start:
+                    # The pair is younger than the window; don't ask for older candles again
+                    self._history_start[key] = fetched
+                self._last_sync[key] = time.monotonic()
+                return
+
+            if window_start < first:
+                fetched = await self._backfill(symbol, interval, window_start, first - 1)
+                if fetched is None or fetched > window_start:
+                    self._history_start[key] = fetched if fetched is not None else first
+
+            if time.monotonic() - self._last_sync.get(key, 0) >= self.sync_interval:
+                # Re-fetch from the last stored candle so the in-progress one is updated
+                await self._backfill(symbol, interval, last, None)
+                self._last_sync[key] = time.monotonic()
+
+    async def _backfill(self, symbol: str, interval: str, start_time: int, end_time: Optional[int]) -> Optional[int]:
+        """Page through /klines from start_time, write each page and return the first open_time fetched"""
+        cursor = start_time
+        first_fetched = None
+        while True:
+            page = await self.binance.fetch_klines(symbol, interval, cursor, end_time, PAGE_LIMIT)
+            if not page:
+                break
+            if first_fetched is None:
+                first_fetched = page[0][0]
+            await self._run(self._write_page, symbol, interval, page)
+            if len(page) < PAGE_LIMIT:
+                break
+            cursor = page[-1][0] + 1
+        return first_fetched
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    def _bounds(self, symbol: str, interval: str) -> Tuple[Optional[int], Optional[int]]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(func.min(Candle.open_time), func.max(Candle.open_time))
+                .where(Candle.symbol == symbol, Candle.interval == interval)
+            ).one()
+        return row[0], row[1]
+
+    def _write_page(self, symbol: str, interval: str, page: List[List]):
+        rows = [
+            {
+                "symbol": symbol,
+                "interval": interval,
+                "open_time": int(kline[0]),
+                "open": float(kline[1]),
+                "high": float(kline[2]),
+                "low": float(kline[3]),
+                "close": float(kline[4]),
+                "volume": float(kline[5]),
+                "close_time": int(kline[6]),
+            }
+            for kline in page
+        ]
+        with self.engine.begin() as conn:
+            # Replace the covered range so an updated in-progress candle overwrites the old one
+            conn.execute(
+                delete(Candle).where(
+                    Candle.symbol == symbol,
+                    Candle.interval == interval,
+                    Candle.open_time >= rows[0]["open_time"],
+                    Candle.open_time <= rows[-1]["open_time"],
+                )
+            )
+            conn.execute(insert(Candle), rows)
+
+    def _read_window(self, symbol: str, interval: str, limit: int) -> List[List]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    Candle.open_time, Candle.open, Candle.high, Candle.low,
+                    Candle.close, Candle.volume, Candle.close_time,
+                )
+                .where(Candle.symbol == symbol, Candle.interval == interval)
+                .order_by(Candle.open_time.desc())
+                .limit(limit)
+            ).all()
+        return [list(row) for row in reversed(rows)]
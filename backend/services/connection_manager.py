@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from collections import deque
+from functools import partial
+from typing import Dict, Optional, Union
+
+from services.price_subscriptions import PriceSubscription
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes]
+
+
+class ConnectionClosed(Exception):
+    """Raised by ClientConnection.send once the client has been evicted"""
+
+
+class ClientConnection:
+    """One websocket client with its own bounded send queue and writer task.
+
+    Full-mode frames go through a deque capped at ``queue_size``; when the
+    client falls behind the oldest queued frames are dropped so it only ever
+    receives the latest state. Delta-mode clients are written by their
+    PriceSubscription, which already coalesces updates. Any send that takes
+    longer than ``send_timeout`` evicts the client.
+    """
+
+    def __init__(
+        self,
+        websocket,
+        manager: "ConnectionManager",
+        subscription: Optional[PriceSubscription] = None,
+        queue_size: int = 1,
+        send_timeout: float = 5.0,
+    ):
+        self.websocket = websocket
+        self.manager = manager
+        self.subscription = subscription
+        self.send_timeout = send_timeout
+        self.queue: deque = deque(maxlen=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self, snapshot):
+        """Start the writer task; ``snapshot`` is the first frame (full mode) or price rows (delta mode)"""
+        if self.subscription is None:
+            if snapshot:
+                self.enqueue(snapshot)
+            self._writer = asyncio.create_task(self._write(self._write_queue))
+        else:
+            self._writer = asyncio.create_task(self._write(partial(self.subscription.run, snapshot, self.send)))
+
+    def stop(self):
+        """Mark the client closed and cancel its writer task"""
+        self.closed = True
+        # An eviction from inside send() ends the writer with ConnectionClosed instead
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            self._writer = None
+
+    def enqueue(self, frame: Frame):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(frame)
+        self._ready.set()
+
+    async def send(self, frame: Frame):
+        """Send one frame, evicting the client (and raising ConnectionClosed) if it doesn't drain within the deadline"""
+        if self.closed:
+            raise ConnectionClosed("client already closed")
+        if isinstance(frame, bytes):
+            send = self.websocket.send_bytes(frame)
+        else:
+            send = self.websocket.send_text(frame)
+        try:
+            await asyncio.wait_for(send, self.send_timeout)
+        except asyncio.TimeoutError:
+            self.manager.evict(self, "send timed out")
+            raise ConnectionClosed("send timed out")
+        except Exception as e:
+            self.manager.evict(self, str(e), slow=False)
+            raise ConnectionClosed(str(e)) from e
+
+    async def _write(self, writer):
+        """Run a writer coroutine function until the client is closed; real cancellation still propagates"""
+        # Called here, so a writer cancelled before it starts leaves no un-awaited coroutine
+        try:
+            await writer()
+        except ConnectionClosed:
+            # The client is already gone from the registry
+            pass
+
+    async def _write_queue(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self.queue:
+                await self.send(self.queue.popleft())
+
+
+class ConnectionManager:
+    """Registry of /ws/prices clients keyed by websocket.
+
+    Broadcasting only appends to each client's queue, so one stalled browser
+    never delays the others; the per-client writer tasks do the sending.
+    """
+
+    def __init__(self, queue_size: int = 1, send_timeout: float = 5.0):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.clients: Dict[object, ClientConnection] = {}
+        self.evictions = 0
+        # Close tasks for evicted sockets, referenced until done so they aren't collected mid-close
+        self._closing: set = set()
+
+    @property
+    def has_clients(self) -> bool:
+        return bool(self.clients)
+
+    async def connect(self, websocket, subscription: Optional[PriceSubscription] = None, snapshot=None):
+        await websocket.accept()
+        client = ClientConnection(websocket, self, subscription, self.queue_size, self.send_timeout)
+        self.clients[websocket] = client
+        client.start(snapshot)
+        return client
+
+    def disconnect(self, websocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.stop()
+
+    def evict(self, client: ClientConnection, reason: str, slow: bool = True):
+        """Drop a client that can't keep up (or whose socket failed) and close it in the background"""
+        if self.clients.get(client.websocket) is not client:
+            return
+        logger.info("Evicting WebSocket client: %s", reason)
+        if slow:
+            self.evictions += 1
+        del self.clients[client.websocket]
+        client.stop()
+        task = asyncio.create_task(self._close(client.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+    async def broadcast(self, message: Frame):
+        """Queue a full-mode frame for every full-mode client"""
+        for client in list(self.clients.values()):
+            if client.subscription is None:
+                client.enqueue(message)
+
+    def publish(self, changes: Dict[str, Dict]):
+        """Hand changed rows to every delta-mode client; each one coalesces and flushes on its own"""
+        if not changes:
+            return
+        for client in list(self.clients.values()):
+            if client.subscription is not None:
+                client.subscription.offer(changes)
+
+    def stats(self) -> Dict:
+        full = sum(1 for client in self.clients.values() if client.subscription is None)
+        return {
+            "clients": len(self.clients),
+            "full_mode": full,
+            "delta_mode": len(self.clients) - full,
+            "dropped_frames": sum(client.dropped for client in self.clients.values()),
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,204 @@
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services import indicators
+from services.quote_cache import INTERVAL_SECONDS
+
+FORECAST_DAYS = 7
+
+MODELS = ("heuristic", "prophet")
+
+
+def available_models() -> List[str]:
+    """Models usable here; Prophet is optional and only checked for, not imported, in the API process"""
+    return [model for model in MODELS if model != "prophet" or importlib.util.find_spec("prophet") is not None]
+
+
+def _prophet_projection(times: Sequence[int], closes: Sequence[float], interval_seconds: int, days: int) -> Dict:
+    import pandas as pd
+    from prophet import Prophet
+
+    frame = pd.DataFrame({"ds": pd.to_datetime(list(times), unit="ms"), "y": list(closes)})
+    model = Prophet(daily_seasonality=False, yearly_seasonality=False)
+    model.fit(frame)
+    future = model.make_future_dataframe(periods=days, freq=pd.Timedelta(seconds=interval_seconds), include_history=False)
+    prediction = model.predict(future)
+    return {
+        "price": prediction["yhat"].tolist(),
+        "upper_bound": prediction["yhat_upper"].tolist(),
+        "lower_bound": prediction["yhat_lower"].tolist(),
+    }
+
+
+def run_models(model: str, series: List[Tuple[List[int], List[float]]], interval_seconds: int, days: int = FORECAST_DAYS) -> List[Dict]:
+    """Process-pool entry point: indicator summaries plus a projection for each (open_times, closes) series.
+
+    The indicator summary (volatility, RSI, ...) is always the batched NumPy one;
+    non-heuristic models replace its price projection with their own.
+    """
+    results = indicators.summarize_many([closes for _, closes in series])
+    if model == "prophet":
+        for result, (times, closes) in zip(results, series):
+            result.update(_prophet_projection(times, closes, interval_seconds, days))
+    return results
+
+
+def build_forecast(symbol: str, summary: Dict, model: str = "heuristic", interval: str = "1d") -> Dict:
+    """Shape a model summary as the /forecast response, one step per ``interval`` candle"""
+    step = INTERVAL_SECONDS.get(interval, 86400)
+    # Intraday steps need the time of day to tell them apart
+    date_format = "%Y-%m-%d" if step >= 86400 else "%Y-%m-%d %H:%M" if step >= 60 else "%Y-%m-%d %H:%M:%S"
+    now = datetime.now()
+    dates = [(now + timedelta(seconds=step * (i + 1))).strftime(date_format) for i in range(FORECAST_DAYS)]
+    forecast = [
+        {
+            "date": date,
+            "price": round(price, 2),
+            "upper_bound": round(upper, 2),
+            "lower_bound": round(lower, 2)
+        }
+        for date, price, upper, lower in zip(
+            dates, summary["price"], summary["upper_bound"], summary["lower_bound"]
+        )
+    ]
+    volatility = summary["volatility"]
+    return {
+        "symbol": symbol,
+        "model": model,
+        "current_price": summary["last_price"],
+        "forecast": forecast,
+        "analysis": {
+            "volatility": round(volatility, 2),
+            "trend_strength": round(summary["trend_strength"], 2),
+            "rsi": round(summary["rsi"], 2),
+            "price_range": round(summary["price_range"], 2),
+            # Original key kept for existing clients; it covers the lookback, not always 30 days
+            "price_range_30d": round(summary["price_range"], 2),
+            "avg_daily_change": round(summary["avg_daily_change"], 2),
+            "confidence_level": "High" if volatility < 2 else "Medium" if volatility < 5 else "Low"
+        }
+    }
+
+
+class ForecastEngine:
+    """Runs forecast models in a process pool and caches the results.
+
+    A forecast is cached under (model, symbol, interval, lookback, last candle),
+    where the last candle is its open time and close, so it is only recomputed
+    once a new candle arrives or the in-progress one moves. Symbols that miss
+    the cache are split into one chunk per worker so a batch uses every core.
+    """
+
+    def __init__(self, binance, workers: Optional[int] = None, max_entries: int = 1024):
+        self.binance = binance
+        self.workers = workers or os.cpu_count() or 1
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the app doesn't start worker processes. Forking
+        # a process that runs an event loop and database pools isn't safe, so workers start
+        # from a clean forkserver (spawn where forkserver isn't available)
+        if self._executor is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "workers": self.workers,
+        }
+
+    def _store(self, key: Tuple, forecast: Dict):
+        self._cache[key] = forecast
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def forecast(
+        self, symbol: str, model: str = "heuristic", interval: str = "1d", lookback: int = 30, binance=None
+    ) -> Dict:
+        forecasts, errors = await self.forecast_many([symbol], model, interval, lookback, binance)
+        if symbol in errors:
+            raise ValueError(errors[symbol])
+        return forecasts[symbol]
+
+    async def forecast_many(
+        self, symbols: List[str], model: str = "heuristic", interval: str = "1d", lookback: int = 30, binance=None
+    ) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """Forecast every symbol, returning (forecasts, errors) keyed by symbol; candles come from ``binance`` if given"""
+        binance = binance or self.binance
+        if model not in available_models():
+            raise ValueError(f"Unsupported model: {model}")
+        symbols = list(dict.fromkeys(symbols))
+        historical_data = await asyncio.gather(
+            *(binance.get_historical_prices(symbol, interval, lookback) for symbol in symbols),
+            return_exceptions=True,
+        )
+
+        forecasts: Dict[str, Dict] = {}
+        errors: Dict[str, str] = {}
+        pending = []
+        for symbol, candles in zip(symbols, historical_data):
+            if isinstance(candles, BaseException):
+                errors[symbol] = str(candles)
+                continue
+            if len(candles) < 2:
+                errors[symbol] = f"Not enough price history for {symbol}"
+                continue
+            key = (model, symbol, interval, lookback, int(candles[-1][0]), float(candles[-1][4]))
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                forecasts[symbol] = cached
+                continue
+            self.misses += 1
+            times = [int(candle[0]) for candle in candles]
+            closes = [float(candle[4]) for candle in candles]
+            pending.append((symbol, key, times, closes))
+
+        if pending:
+            chunk_count = min(self.workers, len(pending))
+            chunks = [pending[i::chunk_count] for i in range(chunk_count)]
+            loop = asyncio.get_running_loop()
+            interval_seconds = INTERVAL_SECONDS.get(interval, 86400)
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        self._pool(), run_models, model, [(times, closes) for _, _, times, closes in chunk], interval_seconds
+                    )
+                    for chunk in chunks
+                ),
+                return_exceptions=True,
+            )
+            for chunk, summaries in zip(chunks, results):
+                for index, (symbol, key, _, _) in enumerate(chunk):
+                    if isinstance(summaries, BaseException):
+                        errors[symbol] = f"Forecast failed: {summaries!r}"
+                        continue
+                    forecast = build_forecast(symbol, summaries[index], model, interval)
+                    self._store(key, forecast)
+                    forecasts[symbol] = forecast
+        return forecasts, errors
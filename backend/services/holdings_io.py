@@ -0,0 +1,241 @@
+import codecs
+import csv
+import io
+import json
+import math
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.models import Holding
+from services.portfolio_service import get_or_create_portfolio, parse_purchase_date
+from utils.database import begin_write
+
+FORMATS = ("csv", "ndjson")
+CSV_COLUMNS = ("symbol", "amount", "purchase_price", "purchase_date")
+# Longest accepted line; anything longer is not a holding row
+MAX_LINE_BYTES = 64 * 1024
+# Per-row errors echoed back in the import summary (the rest are only counted)
+MAX_REPORTED_ERRORS = 100
+
+
+def detect_format(fmt: Optional[str], content_type: Optional[str]) -> str:
+    """``fmt`` when given, else csv or ndjson from the Content-Type"""
+    if fmt is None:
+        content_type = (content_type or "").lower()
+        fmt = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+
+async def iter_line_chunks(chunks: AsyncIterator[bytes], max_lines: int) -> AsyncIterator[List[str]]:
+    """Decode a byte stream into lists of at most ``max_lines`` complete lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    # Raw bytes of the unfinished last line, measured before decoding
+    tail_bytes = 0
+    async for chunk in chunks:
+        last_newline = chunk.rfind(b"\n")
+        if last_newline < 0:
+            longest = tail_bytes = tail_bytes + len(chunk)
+        else:
+            longest = tail_bytes + chunk.find(b"\n")
+            if len(chunk) > MAX_LINE_BYTES:
+                # Only a chunk this long can hold a complete over-long line
+                longest = max(longest, max(map(len, chunk[:last_newline].split(b"\n"))))
+            tail_bytes = len(chunk) - last_newline - 1
+        if max(longest, tail_bytes) > MAX_LINE_BYTES:
+            raise ValueError(f"Line longer than {MAX_LINE_BYTES} bytes")
+        text = tail + decoder.decode(chunk)
+        lines = text.split("\n")
+        tail = lines.pop()
+        for start in range(0, len(lines), max_lines):
+            yield lines[start:start + max_lines]
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield [tail]
+
+
+def validate_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Holding column values from one imported record; raises ValueError when it isn't a valid holding"""
+    symbol = str(record.get("symbol") or "").strip().upper()
+    if not symbol:
+        raise ValueError("symbol is required")
+    amount = float(record.get("amount"))
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError("amount must be a non-negative number")
+    purchase_price = float(record.get("purchase_price") or 0)
+    if not math.isfinite(purchase_price) or purchase_price < 0:
+        raise ValueError("purchase_price must be a non-negative number")
+    purchase_date = record.get("purchase_date") or None
+    if purchase_date is not None:
+        purchase_date = parse_purchase_date(str(purchase_date).strip())
+        if purchase_date is None:
+            raise ValueError("purchase_date must be YYYY-MM-DD or ISO 8601")
+    return {"coin_id": symbol, "amount": amount, "purchase_price": purchase_price, "purchase_date": purchase_date}
+
+
+class HoldingsParser:
+    """Turns chunks of CSV or NDJSON lines into validated rows, collecting per-line errors.
+
+    CSV input needs a header row naming at least ``symbol`` and ``amount``;
+    quoted fields may not span lines.
+    """
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.line = 0
+        self.rows = 0
+        self.invalid = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def _records(self, lines: List[str]) -> Iterable[Tuple[int, Any]]:
+        if self.fmt == "ndjson":
+            for text in lines:
+                self.line += 1
+                if text.strip():
+                    yield self.line, text
+            return
+        for fields in csv.reader(lines):
+            self.line += 1
+            if not fields or not any(field.strip() for field in fields):
+                continue
+            if self.header is None:
+                self.header = [field.strip().lower() for field in fields]
+                if "symbol" not in self.header or "amount" not in self.header:
+                    raise ValueError("CSV header must include symbol and amount columns")
+                continue
+            yield self.line, dict(zip(self.header, fields))
+
+    def parse(self, lines: List[str]) -> List[Dict[str, Any]]:
+        """Validated rows from one chunk of lines; invalid lines are counted and skipped"""
+        rows = []
+        for line, record in self._records(lines):
+            try:
+                if self.fmt == "ndjson":
+                    record = json.loads(record)
+                    if not isinstance(record, dict):
+                        raise ValueError("each line must be a JSON object")
+                rows.append(validate_row(record))
+            except (ValueError, TypeError) as e:
+                self.invalid += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({"line": line, "error": str(e)})
+        self.rows += len(rows)
+        return rows
+
+
+def prepare_import(db: Session, user_id: int, portfolio_name: str, replace: bool) -> int:
+    """Get or create the target portfolio and, for a replace, delete its holdings.
+
+    An append commits straight away, so the write lock isn't held while the
+    upload streams in; a replace stays open until the first batch commits.
+    """
+    begin_write(db)
+    try:
+        portfolio = get_or_create_portfolio(db, user_id, portfolio_name)
+    except IntegrityError:
+        # A concurrent first import or save created the user or portfolio; nothing else is pending yet
+        db.rollback()
+        begin_write(db)
+        portfolio = get_or_create_portfolio(db, user_id, portfolio_name)
+    if replace:
+        db.execute(delete(Holding).where(Holding.portfolio_id == portfolio.id))
+    else:
+        db.commit()
+    return portfolio.id
+
+
+def insert_holdings(db: Session, portfolio_id: int, rows: List[Dict[str, Any]]):
+    """Insert one batch of validated rows and commit it"""
+    now = datetime.utcnow()
+    if rows:
+        db.execute(
+            insert(Holding),
+            [
+                dict(row, portfolio_id=portfolio_id, purchase_date=row["purchase_date"] or now, created_at=now, updated_at=now)
+                for row in rows
+            ],
+        )
+    db.commit()
+
+
+async def import_holdings(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    user_id: int,
+    portfolio_name: str,
+    fmt: str,
+    replace: bool = False,
+    batch_size: int = 5000,
+) -> Dict[str, Any]:
+    """Stream an upload into a portfolio, committing every ``batch_size`` valid rows.
+
+    Only the current batch is held in memory. With ``replace`` the old holdings
+    are deleted in the same transaction as the first batch. A failure part-way
+    leaves the batches committed so far; the error names how many rows those were.
+    """
+    parser = HoldingsParser(fmt)
+    portfolio_id = await db.run_sync(prepare_import, user_id, portfolio_name, replace)
+    committed = 0
+    batches = 0
+    pending: List[Dict[str, Any]] = []
+    try:
+        async for lines in iter_line_chunks(chunks, batch_size):
+            pending.extend(parser.parse(lines))
+            if len(pending) >= batch_size:
+                await db.run_sync(insert_holdings, portfolio_id, pending)
+                committed += len(pending)
+                batches += 1
+                pending = []
+        # Also commits a replace whose upload had no valid rows
+        await db.run_sync(insert_holdings, portfolio_id, pending)
+        committed += len(pending)
+        batches += 1
+    except Exception as e:
+        await db.rollback()
+        raise ValueError(f"{str(e)} (after {committed} rows were imported)") from e
+
+    return {
+        "portfolio_id": portfolio_id,
+        "imported": committed,
+        "invalid": parser.invalid,
+        "batches": batches,
+        "errors": parser.errors,
+    }
+
+
+async def export_holdings(
+    session_factory, portfolio_id: int, fmt: str, batch_size: int = 5000
+) -> AsyncIterator[str]:
+    """Yield a portfolio's holdings as CSV or NDJSON, one keyset-paginated batch at a time"""
+    if fmt == "csv":
+        yield ",".join(CSV_COLUMNS) + "\n"
+    last_id = 0
+    async with session_factory() as db:
+        while True:
+            rows = (await db.execute(
+                select(Holding.id, Holding.coin_id, Holding.amount, Holding.purchase_price, Holding.purchase_date)
+                .where(Holding.portfolio_id == portfolio_id, Holding.id > last_id)
+                .order_by(Holding.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            records = [
+                (symbol, amount, purchase_price, purchase_date.isoformat() if purchase_date else "")
+                for _, symbol, amount, purchase_price, purchase_date in rows
+            ]
+            if fmt == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator="\n").writerows(records)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(CSV_COLUMNS, record))) + "\n" for record in records)
@@ -0,0 +1,118 @@
+"""Vectorized technical indicators over closing-price matrices.
+
+Every function takes a 2-D float array shaped ``(symbols, candles)`` (a 1-D
+series is treated as a single symbol) and works along the candle axis, so a
+whole watchlist is processed in one call.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+def as_matrix(closes) -> np.ndarray:
+    """Return closes as a float64 array shaped (symbols, candles)"""
+    return np.atleast_2d(np.asarray(closes, dtype=np.float64))
+
+
+def pct_returns(closes) -> np.ndarray:
+    """Candle-over-candle percentage changes, shape (symbols, candles - 1)"""
+    closes = as_matrix(closes)
+    return np.diff(closes, axis=1) / closes[:, :-1] * 100
+
+
+def ema(values, alpha: float, seed=None) -> np.ndarray:
+    """Exponential moving average with smoothing factor ``alpha``.
+
+    The recursion runs once along the candle axis and is vectorized across
+    symbols. ``seed`` (one value per symbol) replaces the first observation as
+    the starting value.
+    """
+    values = as_matrix(values)
+    out = np.empty_like(values)
+    out[:, 0] = values[:, 0] if seed is None else seed
+    decay = 1.0 - alpha
+    for i in range(1, values.shape[1]):
+        out[:, i] = alpha * values[:, i] + decay * out[:, i - 1]
+    return out
+
+
+def wilder_rsi(closes, period: int = 14) -> np.ndarray:
+    """Latest Wilder RSI per symbol; 50 where there are too few candles"""
+    closes = as_matrix(closes)
+    if closes.shape[1] < period + 1:
+        return np.full(closes.shape[0], 50.0)
+
+    deltas = np.diff(closes, axis=1)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+
+    # Seed with the simple average of the first period, then apply Wilder smoothing
+    alpha = 1.0 / period
+    avg_gain = ema(gains[:, period - 1:], alpha, seed=gains[:, :period].mean(axis=1))[:, -1]
+    avg_loss = ema(losses[:, period - 1:], alpha, seed=losses[:, :period].mean(axis=1))[:, -1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+def sma_crossover(closes, fast: int = 7, slow: int = 14) -> np.ndarray:
+    """Percent distance of the fast SMA above the slow SMA at the latest candle"""
+    closes = as_matrix(closes)
+    sma_fast = closes[:, -fast:].mean(axis=1)
+    sma_slow = closes[:, -slow:].mean(axis=1)
+    return (sma_fast / sma_slow - 1) * 100
+
+
+def price_range_percent(closes) -> np.ndarray:
+    """High-low range of the closes as a percentage of the low"""
+    closes = as_matrix(closes)
+    low = closes.min(axis=1)
+    high = closes.max(axis=1)
+    return (high - low) / low * 100
+
+
+def summarize(closes) -> Dict[str, np.ndarray]:
+    """Forecast inputs for every symbol in an equal-length closes matrix"""
+    closes = as_matrix(closes)
+    returns = pct_returns(closes)
+    return {
+        "last_price": closes[:, -1],
+        "avg_daily_change": returns.mean(axis=1),
+        "volatility": returns.std(axis=1),
+        "trend_strength": sma_crossover(closes),
+        "rsi": wilder_rsi(closes),
+        "price_range": price_range_percent(closes),
+    }
+
+
+def project_prices(summary: Dict[str, np.ndarray], days: int = 7) -> Dict[str, np.ndarray]:
+    """Compound the trend-adjusted average change forward, with widening bounds"""
+    steps = np.arange(1, days + 1)
+    predicted_change = summary["avg_daily_change"] * (1 + summary["trend_strength"] / 100)
+    growth = (1 + predicted_change / 100)[:, None] ** steps
+    prices = summary["last_price"][:, None] * growth
+    confidence = summary["volatility"][:, None] * np.sqrt(steps) / 100
+    return {
+        "price": prices,
+        "upper_bound": prices * (1 + confidence),
+        "lower_bound": prices * (1 - confidence),
+    }
+
+
+def summarize_many(series: Sequence[Sequence[float]]) -> List[Dict[str, float]]:
+    """Summaries for series of possibly different lengths, batched by length"""
+    results: List[Dict[str, float]] = [None] * len(series)
+    by_length: Dict[int, List[int]] = {}
+    for index, closes in enumerate(series):
+        by_length.setdefault(len(closes), []).append(index)
+
+    for indexes in by_length.values():
+        matrix = as_matrix([series[i] for i in indexes])
+        summary = summarize(matrix)
+        projection = project_prices(summary)
+        for row, index in enumerate(indexes):
+            result = {name: float(values[row]) for name, values in summary.items()}
+            result.update({name: values[row].tolist() for name, values in projection.items()})
+            results[index] = result
+    return results
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from services.binance_service import BinanceService
+from services.rate_governor import run_in_background
+from utils.encoding import dumps
+from utils.metrics import WS_FANOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class MarketDataHub:
+    """Single producer that refreshes market data and fans it out to all websocket clients.
+
+    The hub owns the only poll loop against Binance, so upstream load does not
+    grow with the number of connected dashboards. Each refresh is serialized once
+    and the same frame is handed to ``manager.broadcast``.
+
+    With several workers only the elected producer runs the loop; ``listeners``
+    forward each frame to the other workers, which feed it in through ``apply``.
+    """
+
+    def __init__(
+        self,
+        manager,
+        binance: BinanceService,
+        symbols: List[str],
+        interval: float = 1.0,
+        ingester=None,
+    ):
+        self.manager = manager
+        self.binance = binance
+        # When a StreamIngester is attached, refresh as soon as it applies a frame
+        self.ingester = ingester
+        # Coins pushed to every /ws/prices subscriber, from config.TRACKED_SYMBOLS
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.snapshot: Dict = {}
+        self.frame: Optional[str] = None
+        # Rows that changed in the latest refresh, for delta-mode subscribers
+        self.changed: Dict[str, Dict] = {}
+        # Called with (frame, changed) after every refresh
+        self.listeners: List[Callable[[str, Dict[str, Dict]], None]] = []
+        # Websocket clients connected to other workers, as reported to the producer
+        self.remote_clients = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background refresh task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background refresh task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def prices(self) -> Dict[str, Dict]:
+        return self.snapshot.get("prices", {})
+
+    async def refresh(self) -> str:
+        """Fetch one market-data snapshot and serialize it as a websocket frame"""
+        prices, changes = await asyncio.gather(
+            self.binance.get_prices(self.symbols),
+            self.binance.get_24h_changes(self.symbols),
+        )
+
+        price_data = {}
+        for symbol in self.symbols:
+            price = prices.get(symbol)
+            change_24h = changes.get(symbol)
+            if price and change_24h:
+                price_data[symbol] = {
+                    "price": price["price"],
+                    "change_24h": change_24h["priceChangePercent"],
+                    "price_change": change_24h["priceChange"],
+                    "last_price": change_24h["lastPrice"]
+                }
+
+        previous = self.prices
+        self.changed = {
+            symbol: row for symbol, row in price_data.items() if previous.get(symbol) != row
+        }
+        self.snapshot = {
+            "timestamp": datetime.now().isoformat(),
+            "prices": price_data
+        }
+        self.frame = dumps(self.snapshot)
+        return self.frame
+
+    async def fan_out(self):
+        """Hand the latest frame to this worker's clients"""
+        with WS_FANOUT_SECONDS.time():
+            self.manager.publish(self.changed)
+            await self.manager.broadcast(self.frame)
+
+    async def apply(self, frame: str, changed: Dict[str, Dict]):
+        """Adopt a frame refreshed by another worker and fan it out locally"""
+        self.snapshot = json.loads(frame)
+        self.frame = frame
+        self.changed = changed
+        await self.fan_out()
+
+    async def _run(self):
+        run_in_background()
+        while True:
+            try:
+                # Nobody is listening, so don't spend upstream requests
+                if self.manager.has_clients or self.remote_clients:
+                    frame = await self.refresh()
+                    for listener in self.listeners:
+                        listener(frame, self.changed)
+                    await self.fan_out()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Error in market data hub: %s", e)
+            if self.ingester is not None and self.ingester.connected:
+                await self.ingester.wait_for_update(self.interval)
+            else:
+                await asyncio.sleep(self.interval)
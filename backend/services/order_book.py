@@ -0,0 +1,397 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.rate_governor import run_in_background
+from services.stream_ingester import BinanceStreamSource
+from services.symbol_registry import CROSS_QUOTE
+
+logger = logging.getLogger(__name__)
+
+# Depth (quote notional) reported by OrderBook.summary, in basis points from the best price
+DEPTH_BANDS_BPS = (10, 50, 100)
+
+
+class BookSide:
+    """Price levels of one side of a book, kept in two parallel sorted lists.
+
+    Bids are stored under negated prices so index 0 is always the best level
+    on both sides. Levels are located with bisect; inserts and deletes shift
+    the lists, which is a memmove over at most ``max_levels`` entries.
+    """
+
+    def __init__(self, descending: bool, max_levels: int = 1000):
+        self.sign = -1.0 if descending else 1.0
+        self.max_levels = max_levels
+        self.keys: List[float] = []
+        self.sizes: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self):
+        self.keys.clear()
+        self.sizes.clear()
+
+    def set(self, price: float, size: float):
+        """Set the size at ``price``; a zero size removes the level"""
+        key = self.sign * price
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            if size:
+                self.sizes[i] = size
+            else:
+                del self.keys[i]
+                del self.sizes[i]
+        elif size and i < self.max_levels:
+            self.keys.insert(i, key)
+            self.sizes.insert(i, size)
+            if len(self.keys) > self.max_levels:
+                self.keys.pop()
+                self.sizes.pop()
+
+    def update(self, levels: List[List[str]]):
+        for price, size in levels:
+            self.set(float(price), float(size))
+
+    @property
+    def best(self) -> Optional[float]:
+        return self.sign * self.keys[0] if self.keys else None
+
+    def levels(self, count: int) -> List[Tuple[float, float]]:
+        return [(self.sign * key, size) for key, size in zip(self.keys[:count], self.sizes[:count])]
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(prices, sizes) from the best level outwards"""
+        return self.sign * np.array(self.keys), np.array(self.sizes)
+
+
+def estimate_fill(side: BookSide, quantity: float, reference: Optional[float] = None) -> Dict:
+    """Walk ``side`` for a market order of ``quantity`` base units.
+
+    Slippage is the average fill price's distance from ``reference`` (the mid
+    price, by default the best level); impact is its distance from the best level.
+    """
+    if quantity <= 0:
+        raise ValueError("quantity must be positive")
+    prices, sizes = side.arrays()
+    if not len(prices):
+        raise ValueError("Order book side is empty")
+    cumulative = np.cumsum(sizes)
+    filled = min(quantity, float(cumulative[-1]))
+    # Level where the order completes (or the last level when the book runs out)
+    last = min(int(np.searchsorted(cumulative, filled)), len(prices) - 1)
+    notional = float(np.dot(prices[:last], sizes[:last]) + (filled - (cumulative[last] - sizes[last])) * prices[last])
+    average = notional / filled
+    best = float(prices[0])
+    reference = reference or best
+    return {
+        "quantity": quantity,
+        "filled": filled,
+        "unfilled": quantity - filled,
+        "notional": notional,
+        "average_price": average,
+        "best_price": best,
+        "worst_price": float(prices[last]),
+        "levels": last + 1,
+        "slippage_bps": abs(average - reference) / reference * 1e4,
+        "impact_bps": abs(average - best) / best * 1e4,
+    }
+
+
+def depth_within(side: BookSide, bps: float) -> Dict:
+    """Base quantity and quote notional resting within ``bps`` of the best level"""
+    prices, sizes = side.arrays()
+    if not len(prices):
+        return {"quantity": 0.0, "notional": 0.0}
+    inside = np.abs(prices - prices[0]) <= prices[0] * bps / 1e4
+    return {"quantity": float(sizes[inside].sum()), "notional": float(np.dot(prices[inside], sizes[inside]))}
+
+
+class OrderBook:
+    """One pair's book, built from a REST snapshot and kept current with @depth diffs.
+
+    Follows Binance's sync procedure: diffs that arrive before the snapshot are
+    buffered, the snapshot is loaded, diffs it already covers are dropped, and
+    every later diff must start right after the last applied update id. A gap
+    marks the book unsynced until the next snapshot.
+    """
+
+    def __init__(self, pair: str, quote: str, max_levels: int = 1000, max_pending: int = 1000):
+        self.pair = pair
+        self.quote = quote
+        self.bids = BookSide(descending=True, max_levels=max_levels)
+        self.asks = BookSide(descending=False, max_levels=max_levels)
+        self.last_update_id = 0
+        self.synced = False
+        # Wall-clock time the levels last changed (snapshot or diff)
+        self.updated_at: Optional[float] = None
+        self.max_pending = max_pending
+        self.pending: List[Dict] = []
+
+    @classmethod
+    def from_snapshot(cls, pair: str, quote: str, snapshot: Dict) -> "OrderBook":
+        book = cls(pair, quote, max_levels=max(len(snapshot.get("bids", [])), len(snapshot.get("asks", [])), 1))
+        book.load_snapshot(snapshot)
+        return book
+
+    def load_snapshot(self, snapshot: Dict) -> bool:
+        """Replace the levels with a /depth snapshot and replay buffered diffs; returns whether the book synced"""
+        self.bids.clear()
+        self.asks.clear()
+        self.bids.update(snapshot["bids"])
+        self.asks.update(snapshot["asks"])
+        self.last_update_id = snapshot["lastUpdateId"]
+        self.synced = True
+        self.updated_at = time.time()
+        pending, self.pending = self.pending, []
+        for event in pending:
+            if not self.apply(event):
+                return False
+        return True
+
+    def apply(self, event: Dict) -> bool:
+        """Apply one depthUpdate event; returns False (and unsyncs) on a sequence gap"""
+        if not self.synced:
+            self.pending.append(event)
+            del self.pending[:-self.max_pending]
+            return True
+        if event["u"] <= self.last_update_id:
+            return True
+        if event["U"] > self.last_update_id + 1:
+            self.synced = False
+            return False
+        self.bids.update(event["b"])
+        self.asks.update(event["a"])
+        self.last_update_id = event["u"]
+        self.updated_at = time.time()
+        return True
+
+    @property
+    def mid(self) -> Optional[float]:
+        if self.bids.best is None or self.asks.best is None:
+            return None
+        return (self.bids.best + self.asks.best) / 2
+
+    def estimate(self, side: str, quantity: float) -> Dict:
+        """Estimate a market ``sell`` (into the bids) or ``buy`` (from the asks) of ``quantity``"""
+        if side not in ("sell", "buy"):
+            raise ValueError("side must be 'sell' or 'buy'")
+        estimate = estimate_fill(self.bids if side == "sell" else self.asks, quantity, self.mid)
+        return dict(estimate, pair=self.pair, quote=self.quote, side=side, mid_price=self.mid)
+
+    def summary(self, levels: int = 10) -> Dict:
+        best_bid, best_ask, mid = self.bids.best, self.asks.best, self.mid
+        return {
+            "pair": self.pair,
+            "quote": self.quote,
+            "last_update_id": self.last_update_id,
+            "best_bid": best_bid,
+            "best_ask": best_ask,
+            "mid_price": mid,
+            "spread_bps": (best_ask - best_bid) / mid * 1e4 if mid else None,
+            "depth": {
+                f"{bps}bps": {"bids": depth_within(self.bids, bps), "asks": depth_within(self.asks, bps)}
+                for bps in DEPTH_BANDS_BPS
+            },
+            "bids": self.bids.levels(levels),
+            "asks": self.asks.levels(levels),
+        }
+
+
+class OrderBookMirror:
+    """Local books for the tracked coins, fed by one combined @depth stream.
+
+    Books that are not synced (startup, after a gap or a reconnect) are
+    re-snapshotted over REST as background work. ``book()`` serves a mirrored
+    book when it is in sync and otherwise falls back to a one-off (cached)
+    REST snapshot, so it also covers coins that aren't mirrored.
+    """
+
+    def __init__(
+        self,
+        binance,
+        stream_url: str,
+        symbols: Optional[List[str]] = None,
+        depth: int = 1000,
+        fallback_depth: int = 100,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.binance = binance
+        self.stream_url = stream_url
+        self.symbols = symbols or []
+        self.depth = depth
+        self.fallback_depth = fallback_depth
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.books: Dict[str, OrderBook] = {}
+        self.connected = False
+        self.resyncs = 0
+        self.gaps = 0
+        self._by_pair: Dict[str, OrderBook] = {}
+        self._resyncing: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Create a book per tracked symbol and start the depth stream task"""
+        self.books = {}
+        for symbol in self.symbols:
+            route = self.binance.route(symbol)
+            if route is not None:
+                self.books[symbol] = OrderBook(route.pair, route.quote, max_levels=self.depth)
+        self._by_pair = {book.pair: book for book in self.books.values()}
+        if self.books and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the stream task and any snapshot requests in flight"""
+        tasks = list(self._resyncing.values()) + ([self._task] if self._task is not None else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._resyncing.clear()
+        self._task = None
+        self.connected = False
+
+    def stats(self) -> Dict:
+        """Mirror health: sync state, resyncs and gaps, the stalest synced book and the thinnest side"""
+        synced = [book for book in self.books.values() if book.synced]
+        now = time.time()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "connected": self.connected,
+            "books": len(self.books),
+            "synced": len(synced),
+            "resyncs": self.resyncs,
+            "gaps": self.gaps,
+            "update_lag_seconds": max((now - book.updated_at for book in synced), default=None),
+            "min_depth": min((min(len(book.bids), len(book.asks)) for book in synced), default=None),
+        }
+
+    async def book(self, symbol: str, binance=None) -> OrderBook:
+        """The mirrored book for ``symbol`` when in sync, else a fresh REST snapshot (through ``binance`` if given)"""
+        binance = binance or self.binance
+        symbol = symbol.upper()
+        book = self.books.get(symbol)
+        if book is not None and book.synced:
+            return book
+        route = binance.route(symbol)
+        if route is None:
+            raise ValueError(f"Unknown symbol: {symbol}")
+        snapshot = await binance.get_order_book(symbol, limit=self.fallback_depth)
+        return OrderBook.from_snapshot(route.pair, route.quote, snapshot)
+
+    def handle_frame(self, frame: str):
+        payload = json.loads(frame)
+        event = payload.get("data", payload)
+        if event.get("e") != "depthUpdate":
+            return
+        book = self._by_pair.get(event["s"])
+        if book is None:
+            return
+        if not book.apply(event):
+            self.gaps += 1
+            logger.info("Order book gap for %s, resyncing", book.pair)
+        if not book.synced:
+            self._resync(book)
+
+    def _resync(self, book: OrderBook):
+        if book.pair not in self._resyncing:
+            self._resyncing[book.pair] = asyncio.create_task(self._load_snapshot(book))
+
+    async def _load_snapshot(self, book: OrderBook):
+        try:
+            snapshot = await self.binance._get("/depth", {"symbol": book.pair, "limit": self.depth})
+            self.resyncs += 1
+            # Diffs buffered since the gap are replayed; another gap waits for the next diff
+            book.load_snapshot(snapshot)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Error loading %s order book snapshot: %s", book.pair, e)
+        finally:
+            self._resyncing.pop(book.pair, None)
+
+    async def _run(self):
+        run_in_background()
+        streams = "/".join(f"{pair.lower()}@depth@100ms" for pair in self._by_pair)
+        source = BinanceStreamSource(lambda: self.binance.session, f"{self.stream_url}?streams={streams}")
+        backoff = self.backoff_initial
+        while True:
+            try:
+                async for frame in source.frames():
+                    self.connected = True
+                    backoff = self.backoff_initial
+                    try:
+                        self.handle_frame(frame)
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.debug("Skipping malformed depth frame: %s", e)
+                logger.info("Order book stream closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Order book stream error: %s", e)
+            # Diffs were lost while disconnected, so every book needs a new snapshot
+            self.connected = False
+            for book in self.books.values():
+                book.synced = False
+                book.pending.clear()
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, self.backoff_max)
+
+
+async def estimate_liquidation(mirror: OrderBookMirror, amounts: Dict[str, float], binance=None) -> Dict:
+    """Estimate selling every holding at its full size into the current bids.
+
+    Proceeds and mark values (amount x mid) are converted to dollars at the
+    mid of the cross pair for coins that only trade against BTC.
+    """
+    symbols = list(amounts)
+    books = await asyncio.gather(*(mirror.book(symbol, binance) for symbol in symbols), return_exceptions=True)
+    cross_mid = None
+    if any(not isinstance(book, BaseException) and book.quote == CROSS_QUOTE for book in books):
+        cross_mid = (await mirror.book(CROSS_QUOTE, binance)).mid
+
+    holdings, errors = [], {}
+    for symbol, book in zip(symbols, books):
+        try:
+            if isinstance(book, BaseException):
+                raise book
+            estimate = book.estimate("sell", amounts[symbol])
+            to_usd = cross_mid if book.quote == CROSS_QUOTE else 1.0
+            if not to_usd or estimate["mid_price"] is None:
+                raise ValueError(f"No dollar price for {book.pair}")
+        except Exception as e:
+            errors[symbol] = str(e)
+            continue
+        mark_value = amounts[symbol] * estimate["mid_price"] * to_usd
+        holdings.append(dict(
+            estimate,
+            symbol=symbol,
+            mark_value_usd=mark_value,
+            proceeds_usd=estimate["notional"] * to_usd,
+            # Unfilled size is valued at zero: the visible book can't absorb it
+            cost_usd=mark_value - estimate["notional"] * to_usd,
+        ))
+
+    mark_value = sum(holding["mark_value_usd"] for holding in holdings)
+    proceeds = sum(holding["proceeds_usd"] for holding in holdings)
+    return {
+        "holdings": holdings,
+        "errors": errors,
+        "mark_value_usd": mark_value,
+        "proceeds_usd": proceeds,
+        "cost_usd": mark_value - proceeds,
+        "cost_bps": (mark_value - proceeds) / mark_value * 1e4 if mark_value else 0.0,
+    }
@@ -0,0 +1,102 @@
+"""Vectorized risk and return analytics for many portfolios at once.
+
+Close prices for every coin involved are aligned into one pandas frame
+(candles x coins) and portfolio weights into another (portfolios x coins), so
+each metric is a single matrix operation over all portfolios instead of a
+Python loop per portfolio.
+"""
+import asyncio
+from statistics import NormalDist
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.quote_cache import INTERVAL_SECONDS
+
+
+def periods_per_year(interval: str) -> float:
+    """Candles per year for an interval; crypto trades around the clock"""
+    return 365 * 86400 / INTERVAL_SECONDS.get(interval, 86400)
+
+
+async def load_close_matrix(binance, symbols: List[str], interval: str = "1d", lookback: int = 90) -> pd.DataFrame:
+    """Closing prices for ``symbols`` aligned on candle open time (only candles every symbol has).
+
+    Symbols without enough history are left out of the frame.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    results = await asyncio.gather(
+        *(binance.get_historical_prices(symbol, interval, lookback) for symbol in symbols),
+        return_exceptions=True,
+    )
+    columns = {}
+    for symbol, candles in zip(symbols, results):
+        if isinstance(candles, BaseException) or len(candles) < 2:
+            continue
+        columns[symbol] = pd.Series(
+            [float(candle[4]) for candle in candles], index=[int(candle[0]) for candle in candles]
+        )
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1, join="inner").sort_index()
+
+
+def holdings_matrix(rows: List[Tuple]) -> Tuple[pd.DataFrame, pd.Series]:
+    """Coin amounts per portfolio (portfolios x coins) and portfolio names, from (portfolio_id, name, symbol, amount) rows"""
+    holdings = pd.DataFrame(rows, columns=["portfolio_id", "name", "symbol", "amount"])
+    amounts = holdings.pivot_table(index="portfolio_id", columns="symbol", values="amount", aggfunc="sum", fill_value=0.0)
+    return amounts, holdings.groupby("portfolio_id")["name"].first()
+
+
+def value_weights(amounts: pd.DataFrame, last_prices: pd.Series) -> pd.DataFrame:
+    """Turn coin amounts (portfolios x coins) into market-value weights that sum to 1 per portfolio"""
+    values = amounts.reindex(columns=last_prices.index, fill_value=0.0).mul(last_prices, axis=1)
+    totals = values.sum(axis=1)
+    return values.div(totals.where(totals > 0), axis=0).fillna(0.0)
+
+
+def analyze_portfolios(
+    closes: pd.DataFrame,
+    weights: pd.DataFrame,
+    confidence: float = 0.95,
+    risk_free_rate: float = 0.0,
+    periods: float = 365.0,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Risk and return metrics for every portfolio (row of ``weights``) in one pass.
+
+    Returns (metrics, covariance, correlation). ``metrics`` has one row per
+    portfolio; returns, volatility, drawdown and VaR are percentages per
+    candle unless the column says otherwise. The covariance/correlation
+    matrices are of per-candle coin returns.
+    """
+    returns = closes.pct_change().iloc[1:]
+    weights = weights.reindex(columns=closes.columns, fill_value=0.0)
+
+    # (candles x coins) @ (coins x portfolios) -> (candles x portfolios)
+    portfolio_returns = returns.to_numpy() @ weights.to_numpy().T
+    mean = portfolio_returns.mean(axis=0)
+    std = portfolio_returns.std(axis=0, ddof=1)
+
+    equity = np.vstack([np.ones(portfolio_returns.shape[1]), np.cumprod(1 + portfolio_returns, axis=0)])
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+
+    excess = mean - risk_free_rate / periods
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, excess / std * np.sqrt(periods), 0.0)
+
+    z = NormalDist().inv_cdf(1 - confidence)
+    metrics = pd.DataFrame(
+        {
+            "total_return": (equity[-1] - 1) * 100,
+            "mean_return": mean * 100,
+            "volatility": std * 100,
+            "annualized_volatility": std * np.sqrt(periods) * 100,
+            "sharpe_ratio": sharpe,
+            "max_drawdown": drawdown.min(axis=0) * 100,
+            "var_historical": -np.quantile(portfolio_returns, 1 - confidence, axis=0) * 100,
+            "var_parametric": -(mean + z * std) * 100,
+        },
+        index=weights.index,
+    )
+    return metrics, returns.cov(), returns.corr()
@@ -0,0 +1,195 @@
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.models import Holding, Portfolio, User
+from utils.database import begin_write
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+DELETE_CHUNK_SIZE = 500
+
+
+@lru_cache(maxsize=4096)
+def parse_purchase_date(value: str) -> Optional[datetime]:
+    """Parse a YYYY-MM-DD (or ISO 8601) purchase date; imports repeat the same few dates a lot"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def normalize_holding(holding_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn an incoming holding dict into Holding column values"""
+    purchase_date = holding_data.get("purchase_date")
+    purchase_date = parse_purchase_date(purchase_date) if isinstance(purchase_date, str) and purchase_date else None
+    return {
+        "id": holding_data.get("id"),
+        "coin_id": holding_data["symbol"],
+        "amount": float(holding_data["amount"]),
+        "purchase_price": float(holding_data.get("purchase_price") or 0),
+        "purchase_date": purchase_date,
+    }
+
+
+def get_or_create_portfolio(db: Session, user_id: int, portfolio_name: str) -> Portfolio:
+    """Return the user's portfolio by name, creating the user and portfolio if needed (no commit)"""
+    user = db.get(User, user_id)
+    if not user:
+        user = User(id=user_id, email=f"user{user_id}@example.com", username=f"user{user_id}")
+        db.add(user)
+
+    portfolio = db.execute(
+        select(Portfolio).where(Portfolio.user_id == user_id, Portfolio.name == portfolio_name)
+    ).scalars().first()
+    if not portfolio:
+        portfolio = Portfolio(user_id=user_id, name=portfolio_name)
+        db.add(portfolio)
+        db.flush()
+    return portfolio
+
+
+def diff_holdings(
+    existing: List[Tuple], incoming: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[int], int]:
+    """Match incoming holdings against stored rows.
+
+    ``existing`` rows are (id, coin_id, amount, purchase_price, purchase_date).
+    Rows are matched by explicit id first, then by identical values, then
+    undated incoming rows by (coin, amount, price); leftovers for the same coin
+    become updates and anything else is an insert or a delete.
+
+    Returns (inserts, updates, delete_ids, unchanged_count).
+    """
+    by_id = {row[0]: row for row in existing}
+    remaining = dict(by_id)
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    unchanged = 0
+    pending: List[Dict[str, Any]] = []
+
+    def changed(row: Tuple, values: Dict[str, Any]) -> bool:
+        return (row[1], row[2], row[3]) != (values["coin_id"], values["amount"], values["purchase_price"]) or (
+            values["purchase_date"] is not None and row[4] != values["purchase_date"]
+        )
+
+    # 1. Explicit ids
+    for values in incoming:
+        row = remaining.pop(values["id"], None) if values["id"] is not None else None
+        if row is None:
+            pending.append(values)
+        elif changed(row, values):
+            updates.append(dict(values, purchase_date=values["purchase_date"] or row[4]))
+        else:
+            unchanged += 1
+
+    # 2. Identical rows, then undated rows against any date
+    exact = defaultdict(list)
+    loose = defaultdict(list)
+    for row in remaining.values():
+        exact[(row[1], row[2], row[3], row[4])].append(row[0])
+        loose[(row[1], row[2], row[3])].append(row[0])
+    unmatched: List[Dict[str, Any]] = []
+    for values in pending:
+        key = (values["coin_id"], values["amount"], values["purchase_price"])
+        candidates = exact.get(key + (values["purchase_date"],)) if values["purchase_date"] is not None else loose.get(key)
+        row_id = None
+        while candidates:
+            candidate = candidates.pop()
+            if candidate in remaining:
+                row_id = candidate
+                break
+        if row_id is None:
+            unmatched.append(values)
+        else:
+            del remaining[row_id]
+            unchanged += 1
+
+    # 3. Reuse leftover rows of the same coin as updates
+    leftovers = defaultdict(list)
+    for row in remaining.values():
+        leftovers[row[1]].append(row[0])
+    for values in unmatched:
+        ids = leftovers.get(values["coin_id"])
+        if ids:
+            row_id = ids.pop()
+            del remaining[row_id]
+            updates.append(dict(values, id=row_id, purchase_date=values["purchase_date"] or by_id[row_id][4]))
+        else:
+            inserts.append(values)
+
+    return inserts, updates, list(remaining), unchanged
+
+
+def save_portfolio_holdings(
+    db: Session, user_id: int, portfolio_name: str, holdings: List[Dict[str, Any]]
+) -> Dict[str, int]:
+    """Replace a portfolio's holdings with ``holdings`` in a single transaction.
+
+    Only the difference against the stored rows is written, using one
+    executemany per statement type; unchanged rows are left untouched.
+    """
+    incoming = [normalize_holding(holding_data) for holding_data in holdings]
+    # Take the write lock before reading, so concurrent saves queue up instead of failing on upgrade
+    begin_write(db)
+    try:
+        portfolio = get_or_create_portfolio(db, user_id, portfolio_name)
+    except IntegrityError:
+        # A concurrent first save created the user or portfolio; nothing else is pending yet
+        db.rollback()
+        begin_write(db)
+        portfolio = get_or_create_portfolio(db, user_id, portfolio_name)
+
+    existing = db.execute(
+        select(Holding.id, Holding.coin_id, Holding.amount, Holding.purchase_price, Holding.purchase_date)
+        .where(Holding.portfolio_id == portfolio.id)
+    ).all()
+    inserts, updates, delete_ids, unchanged = diff_holdings(existing, incoming)
+
+    now = datetime.utcnow()
+    for start in range(0, len(delete_ids), DELETE_CHUNK_SIZE):
+        db.execute(delete(Holding).where(Holding.id.in_(delete_ids[start:start + DELETE_CHUNK_SIZE])))
+    if updates:
+        db.execute(
+            update(Holding),
+            [
+                {
+                    "id": values["id"],
+                    "coin_id": values["coin_id"],
+                    "amount": values["amount"],
+                    "purchase_price": values["purchase_price"],
+                    "purchase_date": values["purchase_date"] or now,
+                    "updated_at": now,
+                }
+                for values in updates
+            ],
+        )
+    if inserts:
+        db.execute(
+            insert(Holding),
+            [
+                {
+                    "portfolio_id": portfolio.id,
+                    "coin_id": values["coin_id"],
+                    "amount": values["amount"],
+                    "purchase_price": values["purchase_price"],
+                    "purchase_date": values["purchase_date"] or now,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for values in inserts
+            ],
+        )
+    db.commit()
+
+    return {
+        "portfolio_id": portfolio.id,
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(delete_ids),
+        "unchanged": unchanged,
+    }
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import random
+from typing import Callable, Dict, Optional
+
+from services.market_data_hub import MarketDataHub
+from utils.encoding import dumps
+
+logger = logging.getLogger(__name__)
+
+PRODUCER = "producer"
+SUBSCRIBER = "subscriber"
+
+
+class PriceBus:
+    """Shares one market-data producer between uvicorn workers over a localhost socket.
+
+    Workers elect the producer by racing to bind ``port``: the winner runs the
+    hub's refresh loop (and anything else passed as ``on_elected``) and writes
+    every frame to the other workers, which only fan it out to their own
+    clients. Messages are newline-delimited: the websocket frame, then the
+    changed rows as JSON. Subscribers report their client count back, one line
+    per change, so the producer keeps polling while anyone is listening. When
+    the producer exits its subscribers see EOF and hold a new election.
+    """
+
+    def __init__(
+        self,
+        hub: MarketDataHub,
+        port: int,
+        host: str = "127.0.0.1",
+        on_elected: Optional[Callable[[], None]] = None,
+        retry_interval: float = 1.0,
+        max_buffer: int = 1 << 20,
+    ):
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        # Subscribers with more unsent bytes than this are dropped; they reconnect and resync
+        self.max_buffer = max_buffer
+        self.role: Optional[str] = None
+        self.elections = 0
+        self.frames_received = 0
+        self._subscribers: Dict[asyncio.StreamWriter, int] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def start(self):
+        """Start the election / subscription task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop serving or following, closing every bus connection"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._subscribers):
+            writer.close()
+        self._subscribers.clear()
+        if self.publish in self.hub.listeners:
+            self.hub.listeners.remove(self.publish)
+        self.role = None
+
+    def stats(self) -> Dict:
+        return {
+            "role": self.role,
+            "port": self.port,
+            "subscribers": self.subscribers,
+            "remote_clients": self.hub.remote_clients,
+            "elections": self.elections,
+            "frames_received": self.frames_received,
+        }
+
+    def publish(self, frame: str, changed: Dict[str, Dict]):
+        """Write one refresh to every subscriber; registered as a hub listener on the producer"""
+        if not self._subscribers:
+            return
+        message = f"{frame}\n{dumps(changed)}\n".encode()
+        for writer in list(self._subscribers):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                logger.warning("Dropping price bus subscriber that stopped reading")
+                self._drop(writer)
+                continue
+            writer.write(message)
+
+    def _drop(self, writer: asyncio.StreamWriter):
+        self._subscribers.pop(writer, None)
+        self.hub.remote_clients = sum(self._subscribers.values())
+        writer.close()
+
+    async def _run(self):
+        while True:
+            try:
+                self._server = await asyncio.start_server(self._serve, self.host, self.port)
+            except OSError:
+                # Another worker holds the port
+                try:
+                    await self._follow()
+                except (OSError, ValueError) as e:
+                    logger.debug("Price bus connection failed: %s", e)
+                # Stagger re-elections so the survivors don't all race at once
+                await asyncio.sleep(self.retry_interval * random.uniform(0.5, 1.5))
+                continue
+            self.role = PRODUCER
+            self.elections += 1
+            logger.info("Elected market-data producer on %s:%d", self.host, self.port)
+            self.hub.listeners.append(self.publish)
+            if self.on_elected is not None:
+                self.on_elected()
+            await self._server.serve_forever()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Producer side of one subscriber: send the latest frame, then track its client count"""
+        self._subscribers[writer] = 0
+        if self.hub.frame is not None:
+            writer.write(f"{self.hub.frame}\n{dumps(self.hub.prices)}\n".encode())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._subscribers[writer] = int(line)
+                self.hub.remote_clients = sum(self._subscribers.values())
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._drop(writer)
+
+    async def _follow(self):
+        """Subscriber side: apply the producer's frames until it goes away"""
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=self.max_buffer)
+        self.role = SUBSCRIBER
+        logger.info("Following market-data producer on %s:%d", self.host, self.port)
+        reporter = asyncio.create_task(self._report_clients(writer))
+        try:
+            while True:
+                frame = await reader.readline()
+                changed = await reader.readline()
+                if not changed:
+                    logger.info("Market-data producer went away, re-electing")
+                    return
+                self.frames_received += 1
+                await self.hub.apply(frame.decode().rstrip("\n"), json.loads(changed))
+        finally:
+            reporter.cancel()
+            writer.close()
+            self.role = None
+
+    async def _report_clients(self, writer: asyncio.StreamWriter):
+        """Tell the producer how many clients this worker has whenever the count changes"""
+        reported = None
+        while True:
+            count = len(self.hub.manager.clients)
+            if count != reported:
+                writer.write(f"{count}\n".encode())
+                reported = count
+            await asyncio.sleep(self.retry_interval)
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Union
+
+from utils.encoding import dumps
+
+try:
+    import msgpack
+except ImportError:  # msgpack encoding is optional
+    msgpack = None
+
+ENCODINGS = ("json", "compact", "msgpack")
+
+# Field order for compact rows: [symbol, price, change_24h, price_change, last_price]
+COMPACT_FIELDS = ("price", "change_24h", "price_change", "last_price")
+
+
+def available_encodings() -> Iterable[str]:
+    return [encoding for encoding in ENCODINGS if encoding != "msgpack" or msgpack is not None]
+
+
+class PriceSubscription:
+    """Delta-mode /ws/prices client: a symbol filter, a rate cap and coalesced pending updates.
+
+    The client first receives a snapshot of its symbols, then only symbols whose
+    quote changed. Changes that arrive faster than ``max_rate`` frames per
+    second are merged, so each flush carries the latest row per symbol.
+
+    Frame formats:
+      json     {"type": "snapshot"|"delta", "ts": <ms>, "prices": {symbol: {...}}}
+      compact  ["s"|"d", <ms>, [[symbol, price, change_24h, price_change, last_price], ...]]
+      msgpack  the compact array, msgpack-encoded and sent as a binary frame
+    """
+
+    def __init__(self, symbols: Optional[Set[str]] = None, max_rate: float = 1.0, encoding: str = "json"):
+        if encoding not in available_encodings():
+            raise ValueError(f"Unsupported encoding: {encoding}")
+        if max_rate <= 0:
+            raise ValueError("max_rate must be positive")
+        self.symbols = symbols
+        self.min_interval = 1.0 / max_rate
+        self.encoding = encoding
+        self.pending: Dict[str, Dict] = {}
+        self._ready = asyncio.Event()
+        self._last_sent = 0.0
+
+    def wants(self, symbol: str) -> bool:
+        return self.symbols is None or symbol in self.symbols
+
+    def offer(self, changes: Dict[str, Dict]):
+        """Queue changed rows for this client, replacing older unsent rows"""
+        for symbol, row in changes.items():
+            if self.wants(symbol):
+                self.pending[symbol] = row
+        if self.pending:
+            self._ready.set()
+
+    def subscribe(self, symbols: Iterable[str], prices: Dict[str, Dict]):
+        """Add symbols and queue their current rows"""
+        symbols = {symbol.upper() for symbol in symbols}
+        if self.symbols is not None:
+            self.symbols |= symbols
+        self.offer({symbol: prices[symbol] for symbol in symbols if symbol in prices})
+
+    def unsubscribe(self, symbols: Iterable[str], all_symbols: Iterable[str]):
+        """Drop symbols; an unfiltered subscription becomes an explicit set first"""
+        if self.symbols is None:
+            self.symbols = set(all_symbols)
+        for symbol in symbols:
+            self.symbols.discard(symbol.upper())
+            self.pending.pop(symbol.upper(), None)
+
+    def encode(self, kind: str, rows: Dict[str, Dict]):
+        ts = int(time.time() * 1000)
+        if self.encoding == "json":
+            return dumps({"type": kind, "ts": ts, "prices": rows})
+        compact = [
+            kind[0],
+            ts,
+            [[symbol] + [row[field] for field in COMPACT_FIELDS] for symbol, row in rows.items()],
+        ]
+        if self.encoding == "msgpack":
+            return msgpack.packb(compact)
+        return dumps(compact)
+
+    async def run(self, snapshot: Dict[str, Dict], send: Callable[[Union[str, bytes]], Awaitable[None]]):
+        """Send the snapshot, then flush coalesced deltas no faster than the rate cap"""
+        await send(self.encode("snapshot", {s: row for s, row in snapshot.items() if self.wants(s)}))
+        self._last_sent = time.monotonic()
+        while True:
+            await self._ready.wait()
+            wait = self._last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            rows, self.pending = self.pending, {}
+            self._ready.clear()
+            if rows:
+                await send(self.encode("delta", rows))
+                self._last_sent = time.monotonic()
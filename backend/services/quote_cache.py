@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from services.rate_governor import run_in_background
+
+logger = logging.getLogger(__name__)
+
+# Seconds per kline interval, used to derive the klines TTL
+INTERVAL_SECONDS = {
+    "1s": 1, "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "8h": 28800, "12h": 43200,
+    "1d": 86400, "3d": 259200, "1w": 604800, "1M": 2592000,
+}
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class QuoteCache:
+    """Bounded LRU cache for upstream quotes with per-kind TTLs.
+
+    Entries are keyed by ``(kind, key)``. A fresh entry is returned as is; an
+    entry past its TTL but still inside the stale window is returned
+    immediately while a background task refreshes it. Concurrent misses for the
+    same key share a single in-flight load.
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        stale_ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = 10000,
+    ):
+        self.ttls = ttls
+        self.stale_ttls = stale_ttls or {}
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._refreshing: set = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def stats(self) -> Dict:
+        """Counters used to size the cache"""
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._entries.clear()
+
+    def _store(self, kind: str, key: Hashable, value: Any, ttl: Optional[float] = None):
+        now = time.monotonic()
+        ttl = self.ttls.get(kind, 0) if ttl is None else ttl
+        stale_ttl = self.stale_ttls.get(kind, 0)
+        cache_key = (kind, key)
+        self._entries[cache_key] = _Entry(value, now + ttl, now + ttl + stale_ttl)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, kind: str, key: Hashable) -> Tuple[Optional[_Entry], bool]:
+        """Return (entry, is_fresh); entry is None when nothing servable is cached"""
+        cache_key = (kind, key)
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None, False
+        now = time.monotonic()
+        if now < entry.expires_at:
+            self._entries.move_to_end(cache_key)
+            return entry, True
+        if now < entry.stale_until:
+            self._entries.move_to_end(cache_key)
+            return entry, False
+        return None, False
+
+    async def get(
+        self,
+        kind: str,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached value for (kind, key), loading it on a miss"""
+        entry, fresh = self._lookup(kind, key)
+        if entry is not None:
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._refresh_in_background(kind, [key], self._single_loader(key, loader), ttl)
+            return entry.value
+
+        cache_key = (kind, key)
+        future = self._inflight.get(cache_key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._inflight.pop(cache_key, None)
+            self._fail(future, e)
+            raise
+        self._store(kind, key, value, ttl)
+        self._inflight.pop(cache_key, None)
+        future.set_result(value)
+        return value
+
+    async def get_many(
+        self,
+        kind: str,
+        keys: Iterable[Hashable],
+        loader: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        ttl: Optional[float] = None,
+    ) -> Dict[Hashable, Any]:
+        """Return cached values for many keys, loading all misses with one loader call.
+
+        ``loader`` receives the list of missing keys and returns a dict; keys it
+        leaves out are cached as ``None`` so unknown symbols are not re-fetched
+        on every lookup. ``None`` values are omitted from the result.
+        """
+        results: Dict[Hashable, Any] = {}
+        stale: List[Hashable] = []
+        waiting: Dict[Hashable, asyncio.Future] = {}
+        missing: List[Hashable] = []
+
+        for key in dict.fromkeys(keys):
+            entry, fresh = self._lookup(kind, key)
+            if entry is not None:
+                if fresh:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    stale.append(key)
+                results[key] = entry.value
+                continue
+            future = self._inflight.get((kind, key))
+            if future is not None:
+                self.coalesced += 1
+                waiting[key] = future
+            else:
+                self.misses += 1
+                missing.append(key)
+
+        if stale:
+            self._refresh_in_background(kind, stale, loader, ttl)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            for key, future in futures.items():
+                self._inflight[(kind, key)] = future
+            try:
+                loaded = await loader(missing)
+            except BaseException as e:
+                for key, future in futures.items():
+                    self._inflight.pop((kind, key), None)
+                    self._fail(future, e)
+                raise
+            for key, future in futures.items():
+                value = loaded.get(key)
+                self._store(kind, key, value, ttl)
+                self._inflight.pop((kind, key), None)
+                future.set_result(value)
+                results[key] = value
+
+        for key, future in waiting.items():
+            results[key] = await asyncio.shield(future)
+
+        return {key: value for key, value in results.items() if value is not None}
+
+    @staticmethod
+    def _fail(future: asyncio.Future, error: BaseException):
+        if isinstance(error, Exception):
+            future.set_exception(error)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+        else:
+            future.cancel()
+
+    @staticmethod
+    def _single_loader(key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        async def load(keys: List[Hashable]) -> Dict[Hashable, Any]:
+            return {key: await loader()}
+        return load
+
+    def _refresh_in_background(self, kind: str, keys: List[Hashable], loader, ttl: Optional[float]):
+        keys = [key for key in keys if (kind, key) not in self._refreshing and (kind, key) not in self._inflight]
+        if not keys:
+            return
+        for key in keys:
+            self._refreshing.add((kind, key))
+        task = asyncio.create_task(self._refresh(kind, keys, loader, ttl))
+        task.add_done_callback(lambda t: t.exception() if not t.cancelled() else None)
+
+    async def _refresh(self, kind: str, keys: List[Hashable], loader, ttl: Optional[float]):
+        # Revalidation runs in its own task, so it can yield to interactive requests
+        run_in_background()
+        self.refreshes += 1
+        try:
+            loaded = await loader(keys)
+            for key in keys:
+                self._store(kind, key, loaded.get(key), ttl)
+        except Exception as e:
+            # Keep serving the stale entry until it ages out
+            logger.warning("Error refreshing %s quotes for %s: %s", kind, keys, e)
+        finally:
+            for key in keys:
+                self._refreshing.discard((kind, key))
+
+
+def klines_ttl(interval: str) -> float:
+    """Klines stay valid for one candle interval"""
+    return float(INTERVAL_SECONDS.get(interval, 60))
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Priority of upstream requests made from the current task; background loops set BACKGROUND
+request_priority: ContextVar[str] = ContextVar("request_priority", default=INTERACTIVE)
+
+
+def run_in_background():
+    """Mark upstream requests from the current task (and tasks it starts) as background work"""
+    request_priority.set(BACKGROUND)
+
+
+def _depth_weight(limit: int) -> int:
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def request_weight(path: str, params: Optional[Dict[str, Any]] = None) -> int:
+    """Binance REQUEST_WEIGHT of a REST call, per the documented endpoint weights"""
+    params = params or {}
+    if path == "/ticker/price":
+        return 2 if "symbol" in params else 4
+    if path == "/ticker/24hr":
+        if "symbol" in params:
+            return 2
+        if "symbols" in params:
+            count = params["symbols"].count(",") + 1
+            return 2 if count <= 20 else 40 if count <= 100 else 80
+        return 80
+    if path == "/depth":
+        return _depth_weight(int(params.get("limit", 100)))
+    if path == "/exchangeInfo":
+        return 20
+    return 2
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling Binance when the governor won't allow a request"""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class RateLimitedError(UpstreamUnavailable):
+    pass
+
+
+class RateGovernor:
+    """Client-side request-weight budget and circuit breaker for the Binance REST API.
+
+    A token bucket refills at ``weight_limit`` per minute. Background requests
+    may not dip into the last ``reserve`` fraction of the bucket, so
+    interactive requests still get through while refresh loops are throttled.
+    The bucket is re-synced from X-MBX-USED-WEIGHT-1M on every response.
+
+    A 429/418 opens the breaker for Retry-After seconds; ``failure_threshold``
+    consecutive 5xx or network errors open it for ``cooldown`` seconds. After
+    that one trial request is let through (half-open) and its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        weight_limit: int = 6000,
+        reserve: float = 0.2,
+        max_wait: float = 10.0,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+    ):
+        self.capacity = float(weight_limit)
+        self.rate = weight_limit / 60.0
+        self.reserve = reserve * weight_limit
+        self.max_wait = max_wait
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.tokens = self.capacity
+        self.state = "closed"
+        self.open_until = 0.0
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.used_weight: Optional[int] = None
+        self.weight_by_endpoint: Dict[str, int] = defaultdict(int)
+        self._updated = time.monotonic()
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open" and time.monotonic() < self.open_until
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _check_breaker(self, now: float):
+        if self.state == "open":
+            if now < self.open_until:
+                self.rejected += 1
+                raise CircuitOpenError(f"Binance circuit open for {self.open_until - now:.1f}s")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError("Binance circuit half-open, trial request in flight")
+            self._trial_in_flight = True
+
+    async def acquire(self, path: str, weight: int):
+        """Wait until ``weight`` can be spent, or raise UpstreamUnavailable"""
+        floor = self.reserve if request_priority.get() == BACKGROUND else 0.0
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            now = time.monotonic()
+            self._check_breaker(now)
+            self._refill(now)
+            if self.tokens - weight >= floor:
+                self.tokens -= weight
+                self.weight_by_endpoint[path] += weight
+                return
+            # Don't hold the half-open trial slot while waiting for tokens
+            self._trial_in_flight = False
+            wait = (weight + floor - self.tokens) / self.rate
+            if now + wait > deadline:
+                self.rejected += 1
+                raise RateLimitedError(f"Binance request weight exhausted for {path}")
+            await asyncio.sleep(wait)
+
+    def observe(self, status: int, headers) -> None:
+        """Update the budget and breaker from a response"""
+        used = headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None:
+            self.used_weight = int(used)
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - self.used_weight)
+        if status in (418, 429):
+            retry_after = headers.get("Retry-After")
+            self.trip(float(retry_after) if retry_after else self.cooldown)
+        elif status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def abandon(self):
+        """A request ended without an upstream outcome (e.g. cancelled); free the half-open trial slot"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_in_flight = False
+        # Requests already in flight when the breaker opened don't close it
+        if self.state == "half_open":
+            self.state = "closed"
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.trip(self.cooldown)
+
+    def trip(self, seconds: float):
+        """Open the breaker for ``seconds``"""
+        self._trial_in_flight = False
+        self.state = "open"
+        self.open_until = max(self.open_until, time.monotonic() + seconds)
+        self.trips += 1
+        logger.warning("Binance circuit open for %.0fs", seconds)
+
+    def stats(self) -> Dict:
+        self._refill(time.monotonic())
+        return {
+            "state": "open" if self.is_open else "half_open" if self.state != "closed" else "closed",
+            "open_for": max(0.0, self.open_until - time.monotonic()) if self.is_open else 0.0,
+            "tokens": round(self.tokens, 1),
+            "capacity": self.capacity,
+            "used_weight_1m": self.used_weight,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "weight_by_endpoint": dict(self.weight_by_endpoint),
+        }
+
+
+class LastKnownGood:
+    """Bounded LRU of the latest successful upstream responses, served while Binance is unavailable"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self.served = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Any:
+        value = self._entries.get(key)
+        if value is not None:
+            self.served += 1
+        return value
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteTable:
+    """Last quote per Binance pair, as pushed by the upstream stream.
+
+    Records use the same field names as the REST tickers (``price``,
+    ``lastPrice``, ``priceChange``, ``priceChangePercent``) so readers can
+    treat them like /ticker/price and /ticker/24hr responses.
+    """
+
+    def __init__(self, max_age: float = 5.0):
+        self.max_age = max_age
+        self._quotes: Dict[str, Dict] = {}
+        self._received_at: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+    def update(self, pair: str, quote: Dict):
+        self._quotes[pair] = quote
+        self._received_at[pair] = time.monotonic()
+
+    def get(self, pair: str) -> Optional[Dict]:
+        """Return the quote for a pair if it is recent enough to trust"""
+        received_at = self._received_at.get(pair)
+        if received_at is None or time.monotonic() - received_at > self.max_age:
+            return None
+        return self._quotes[pair]
+
+    def get_many(self, pairs: List[str]) -> Dict[str, Dict]:
+        quotes = {}
+        for pair in pairs:
+            quote = self.get(pair)
+            if quote is not None:
+                quotes[pair] = quote
+        return quotes
+
+
+def parse_ticker_event(event: Dict) -> Optional[Dict]:
+    """Convert a miniTicker or 24hrTicker stream event into a ticker record"""
+    event_type = event.get("e")
+    if event_type not in ("24hrMiniTicker", "24hrTicker"):
+        return None
+    close = float(event["c"])
+    open_price = float(event["o"])
+    if event_type == "24hrTicker":
+        price_change = float(event["p"])
+        price_change_percent = float(event["P"])
+    else:
+        price_change = close - open_price
+        price_change_percent = price_change / open_price * 100 if open_price else 0.0
+    return {
+        "symbol": event["s"],
+        "price": close,
+        "lastPrice": close,
+        "openPrice": open_price,
+        "highPrice": float(event["h"]),
+        "lowPrice": float(event["l"]),
+        "volume": float(event["v"]),
+        "priceChange": price_change,
+        "priceChangePercent": price_change_percent,
+        "eventTime": event.get("E"),
+    }
+
+
+class BinanceStreamSource:
+    """Upstream Binance websocket stream, yielding raw text frames"""
+
+    def __init__(self, session_getter: Callable[[], aiohttp.ClientSession], url: str, heartbeat: float = 30.0):
+        self.session_getter = session_getter
+        self.url = url
+        self.heartbeat = heartbeat
+
+    async def frames(self) -> AsyncIterator[str]:
+        async with self.session_getter().ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    yield message.data
+                elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+
+
+class ReplayStreamSource:
+    """Offline stand-in that replays stream frames from a file (one JSON frame per line)"""
+
+    def __init__(self, path: str, interval: float = 1.0, loop: bool = True):
+        self.path = path
+        self.interval = interval
+        self.loop = loop
+
+    async def frames(self) -> AsyncIterator[str]:
+        with open(self.path) as f:
+            recorded = [line.strip() for line in f if line.strip()]
+        while True:
+            for frame in recorded:
+                yield frame
+                await asyncio.sleep(self.interval)
+            if not self.loop:
+                return
+
+
+class StreamIngester:
+    """Keeps one upstream stream open and writes every ticker event to a QuoteTable.
+
+    The connection is re-opened with exponential backoff (plus jitter) when it
+    drops. ``updated`` is set after every applied frame so consumers can react
+    to pushes instead of polling.
+    """
+
+    def __init__(
+        self,
+        source,
+        table: QuoteTable,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.source = source
+        self.table = table
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.updated = asyncio.Event()
+        self.connected = False
+        self.frames_received = 0
+        self.reconnects = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the ingestion task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the ingestion task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    def handle_frame(self, frame: str) -> int:
+        """Apply one raw frame to the quote table and return the number of quotes updated"""
+        payload = json.loads(frame)
+        # Combined streams wrap each event as {"stream": ..., "data": ...}
+        if isinstance(payload, dict) and "data" in payload:
+            payload = payload["data"]
+        events = payload if isinstance(payload, list) else [payload]
+
+        updated = 0
+        for event in events:
+            quote = parse_ticker_event(event)
+            if quote is not None:
+                self.table.update(quote["symbol"], quote)
+                updated += 1
+        if updated:
+            self.frames_received += 1
+            self.updated.set()
+        return updated
+
+    async def wait_for_update(self, timeout: float) -> bool:
+        """Wait until the next applied frame, returning False on timeout"""
+        self.updated.clear()
+        try:
+            await asyncio.wait_for(self.updated.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self):
+        backoff = self.backoff_initial
+        while True:
+            try:
+                async for frame in self.source.frames():
+                    self.connected = True
+                    try:
+                        if self.handle_frame(frame):
+                            backoff = self.backoff_initial
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.debug("Skipping malformed stream frame: %s", e)
+                logger.info("Upstream price stream closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Upstream price stream error: %s", e)
+            self.connected = False
+            self.reconnects += 1
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, self.backoff_max)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from services.rate_governor import run_in_background
+
+logger = logging.getLogger(__name__)
+
+# Quote assets treated as US dollars, in order of preference
+USD_QUOTES = ("USDT", "BUSD")
+# Fallback quote asset, converted to dollars through its own USD pair
+CROSS_QUOTE = "BTC"
+
+
+class Route(NamedTuple):
+    """How to price a coin in dollars: ``pair`` directly, or ``pair`` times ``cross``"""
+    pair: str  # e.g., "ETHUSDT" or "XYZBTC"
+    quote: str  # quote asset of ``pair``
+    cross: Optional[str] = None  # e.g., "BTCUSDT" when quote is BTC
+
+
+def build_routes(symbols: Iterable[Dict]) -> Dict[str, Route]:
+    """Pick the best dollar route for every base asset in an /exchangeInfo symbol list"""
+    by_base: Dict[str, Dict[str, str]] = defaultdict(dict)
+    for info in symbols:
+        if info.get("status") == "TRADING":
+            by_base[info["baseAsset"]][info["quoteAsset"]] = info["symbol"]
+
+    def usd_route(quotes: Dict[str, str]) -> Optional[Route]:
+        for quote in USD_QUOTES:
+            if quote in quotes:
+                return Route(quotes[quote], quote)
+        return None
+
+    cross = usd_route(by_base.get(CROSS_QUOTE, {}))
+    routes = {}
+    for base, quotes in by_base.items():
+        route = usd_route(quotes)
+        if route is None and cross is not None and CROSS_QUOTE in quotes:
+            route = Route(quotes[CROSS_QUOTE], CROSS_QUOTE, cross.pair)
+        if route is not None:
+            routes[base] = route
+    return routes
+
+
+class SymbolRegistry:
+    """Trading-pair metadata from /exchangeInfo, refreshed in the background.
+
+    Routes are precomputed per base asset at load time, so validating a coin
+    and choosing its pair is a dict lookup with no upstream request.
+    """
+
+    def __init__(self, binance, refresh_interval: float = 3600.0):
+        self.binance = binance
+        self.refresh_interval = refresh_interval
+        self.routes: Dict[str, Route] = {}
+        self.loaded = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.upper() in self.routes
+
+    def route(self, symbol: str) -> Optional[Route]:
+        return self.routes.get(symbol.upper())
+
+    def filter(self, symbols: Iterable[str]) -> List[str]:
+        """Keep the symbols that have a route, reporting the rest"""
+        valid = [symbol for symbol in symbols if symbol in self]
+        rejected = [symbol for symbol in symbols if symbol not in self]
+        if rejected:
+            logger.warning("Ignoring symbols with no tradable pair: %s", ", ".join(rejected))
+        return valid
+
+    async def load(self):
+        """Fetch /exchangeInfo and rebuild the routes"""
+        data = await self.binance._get("/exchangeInfo")
+        self.routes = build_routes(data.get("symbols", []))
+        self.loaded = True
+        logger.info("Loaded %d tradable coins from exchangeInfo", len(self.routes))
+
+    def start(self):
+        """Start the periodic refresh task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the periodic refresh task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        run_in_background()
+        while True:
+            # Retry sooner while no exchangeInfo has ever loaded
+            await asyncio.sleep(self.refresh_interval if self.loaded else min(self.refresh_interval, 60))
+            try:
+                await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the previous routes
+                logger.warning("Error refreshing exchangeInfo: %s", e)
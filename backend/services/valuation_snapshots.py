@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+
+from models.models import Holding, PortfolioValuation
+from services.rate_governor import run_in_background
+
+logger = logging.getLogger(__name__)
+
+
+class ValuationRecorder:
+    """Background job that writes a valuation snapshot for every portfolio.
+
+    Each tick sums holdings per (portfolio, coin) in the database, quotes
+    every distinct coin with one batch request per ticker endpoint and inserts
+    one ``portfolio_valuations`` row per portfolio in a single executemany.
+    Coins that can't be quoted are left out of both the value and the cost
+    basis of that snapshot; if nothing can be quoted (upstream outage) the
+    tick is skipped rather than recording zeros.
+    """
+
+    def __init__(self, binance, engine, interval: float = 300.0, max_concurrency: int = 10, timeout: float = 3.0):
+        self.binance = binance
+        self.engine = engine
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.snapshots_written = 0
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background snapshot task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background snapshot task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def record(self) -> int:
+        """Write one snapshot per portfolio with holdings and return how many were written"""
+        async with self.engine.connect() as conn:
+            rows = (await conn.execute(
+                select(
+                    Holding.portfolio_id,
+                    Holding.coin_id,
+                    func.sum(Holding.amount).label("amount"),
+                    func.sum(Holding.amount * Holding.purchase_price).label("cost_basis"),
+                )
+                .group_by(Holding.portfolio_id, Holding.coin_id)
+            )).all()
+        if not rows:
+            return 0
+
+        symbols = list(dict.fromkeys(row.coin_id for row in rows))
+        quotes, _ = await self.binance.get_quotes(symbols, self.max_concurrency, self.timeout)
+        # Per-symbol fallbacks report failures as a zero price
+        prices = {symbol: quote["price"] for symbol, quote in quotes.items() if quote.get("price")}
+        if not prices:
+            logger.info("Skipping valuation snapshot: no prices available")
+            return 0
+
+        totals: Dict[int, float] = defaultdict(float)
+        cost_bases: Dict[int, float] = defaultdict(float)
+        coin_values: Dict[int, Dict[str, float]] = defaultdict(dict)
+        for row in rows:
+            price = prices.get(row.coin_id)
+            if price is None:
+                # Leave the coin out of both sums, or the snapshot would show a false loss
+                continue
+            cost_bases[row.portfolio_id] += row.cost_basis or 0
+            value = (row.amount or 0) * price
+            totals[row.portfolio_id] += value
+            coin_values[row.portfolio_id][row.coin_id] = value
+
+        now_ms = int(time.time() * 1000)
+        snapshots = [
+            {
+                "portfolio_id": portfolio_id,
+                "timestamp": now_ms,
+                "total_value": totals[portfolio_id],
+                "cost_basis": cost_basis,
+                "coin_values": coin_values[portfolio_id],
+            }
+            for portfolio_id, cost_basis in cost_bases.items()
+        ]
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(PortfolioValuation), snapshots)
+        self.snapshots_written += len(snapshots)
+        self.last_run = time.time()
+        return len(snapshots)
+
+    async def _run(self):
+        run_in_background()
+        while True:
+            try:
+                await self.record()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Error recording valuation snapshots: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+async def load_history(db, portfolio_id: int, start_ms: int, end_ms: int, points: int = 200) -> Dict:
+    """Downsample a portfolio's snapshots in [start_ms, end_ms] to at most ``points`` buckets.
+
+    Bucketing happens in SQL: rows are grouped by (timestamp - start) // bucket
+    and each bucket reports its last snapshot (highest id, since snapshots are
+    appended in time order) plus the low/high total value seen in the bucket.
+    """
+    bucket_ms = max(1, -(-(end_ms - start_ms + 1) // max(points, 1)))
+    bucket = ((PortfolioValuation.timestamp - start_ms) // bucket_ms).label("bucket")
+    buckets = (
+        select(
+            func.max(PortfolioValuation.id).label("last_id"),
+            func.min(PortfolioValuation.total_value).label("low"),
+            func.max(PortfolioValuation.total_value).label("high"),
+            func.count().label("samples"),
+        )
+        .where(
+            PortfolioValuation.portfolio_id == portfolio_id,
+            PortfolioValuation.timestamp >= start_ms,
+            PortfolioValuation.timestamp <= end_ms,
+        )
+        .group_by(bucket)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(
+            PortfolioValuation.timestamp,
+            PortfolioValuation.total_value,
+            PortfolioValuation.cost_basis,
+            PortfolioValuation.coin_values,
+            buckets.c.low,
+            buckets.c.high,
+            buckets.c.samples,
+        )
+        .join(buckets, PortfolioValuation.id == buckets.c.last_id)
+        .order_by(PortfolioValuation.timestamp)
+    )).all()
+
+    history: List[Dict] = [
+        {
+            "timestamp": row.timestamp,
+            "total_value": row.total_value,
+            "cost_basis": row.cost_basis,
+            "pnl": row.total_value - row.cost_basis,
+            "low": row.low,
+            "high": row.high,
+            "samples": row.samples,
+            "coin_values": row.coin_values,
+        }
+        for row in rows
+    ]
+    return {"bucket_ms": bucket_ms, "history": history}
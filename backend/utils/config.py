@@ -0,0 +1,87 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Binance REST client
+BINANCE_BASE_URL = os.getenv("BINANCE_BASE_URL", "https://api.binance.com/api/v3")
+BINANCE_POOL_LIMIT = int(os.getenv("BINANCE_POOL_LIMIT", "100"))
+BINANCE_POOL_LIMIT_PER_HOST = int(os.getenv("BINANCE_POOL_LIMIT_PER_HOST", "20"))
+BINANCE_TIMEOUT = float(os.getenv("BINANCE_TIMEOUT", "10"))
+BINANCE_CONNECT_TIMEOUT = float(os.getenv("BINANCE_CONNECT_TIMEOUT", "5"))
+BINANCE_DNS_CACHE_TTL = int(os.getenv("BINANCE_DNS_CACHE_TTL", "300"))
+BINANCE_KEEPALIVE_TIMEOUT = float(os.getenv("BINANCE_KEEPALIVE_TIMEOUT", "30"))
+
+# Quote cache (seconds); klines stay fresh for one candle interval
+QUOTE_CACHE_MAX_ENTRIES = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "10000"))
+QUOTE_CACHE_PRICE_TTL = float(os.getenv("QUOTE_CACHE_PRICE_TTL", "1"))
+QUOTE_CACHE_24HR_TTL = float(os.getenv("QUOTE_CACHE_24HR_TTL", "10"))
+QUOTE_CACHE_DEPTH_TTL = float(os.getenv("QUOTE_CACHE_DEPTH_TTL", "1"))
+QUOTE_CACHE_PRICE_STALE_TTL = float(os.getenv("QUOTE_CACHE_PRICE_STALE_TTL", "5"))
+QUOTE_CACHE_24HR_STALE_TTL = float(os.getenv("QUOTE_CACHE_24HR_STALE_TTL", "30"))
+QUOTE_CACHE_KLINES_STALE_TTL = float(os.getenv("QUOTE_CACHE_KLINES_STALE_TTL", "60"))
+
+# Per-symbol portfolio valuation when a batch quote is unavailable
+VALUATION_MAX_CONCURRENCY = int(os.getenv("VALUATION_MAX_CONCURRENCY", "10"))
+VALUATION_TIMEOUT = float(os.getenv("VALUATION_TIMEOUT", "3"))
+
+# Local candle store: minimum seconds between incremental /klines syncs per pair
+CANDLE_SYNC_INTERVAL = float(os.getenv("CANDLE_SYNC_INTERVAL", "60"))
+
+# Upstream websocket ingestion; REST polling is only the fallback
+STREAM_ENABLED = os.getenv("STREAM_ENABLED", "true").lower() in ("1", "true", "yes")
+BINANCE_STREAM_URL = os.getenv("BINANCE_STREAM_URL", "wss://stream.binance.com:9443/ws/!miniTicker@arr")
+# Replay stream frames from this NDJSON file instead of connecting upstream
+STREAM_REPLAY_FILE = os.getenv("STREAM_REPLAY_FILE", "")
+STREAM_MAX_QUOTE_AGE = float(os.getenv("STREAM_MAX_QUOTE_AGE", "5"))
+
+# /ws/prices fan-out: frames kept per slow client, and seconds before a stuck client is evicted
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "1"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+# Portfolio valuation snapshots for /portfolio/{id}/history: seconds between snapshots (0 disables)
+VALUATION_SNAPSHOT_INTERVAL = float(os.getenv("VALUATION_SNAPSHOT_INTERVAL", "300"))
+
+# Forecast engine: worker processes per API worker (0 = CPUs / WORKERS), cached forecasts
+# and the default model
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "0"))
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "1024"))
+FORECAST_DEFAULT_MODEL = os.getenv("FORECAST_DEFAULT_MODEL", "heuristic")
+
+# Coins pushed to /ws/prices clients, and seconds between exchangeInfo refreshes
+TRACKED_SYMBOLS = [
+    symbol.strip().upper()
+    for symbol in os.getenv("TRACKED_SYMBOLS", "BTC,ETH,BNB,SOL,ADA,DOT,AVAX,MATIC,LINK,UNI").split(",")
+    if symbol.strip()
+]
+SYMBOL_REFRESH_INTERVAL = float(os.getenv("SYMBOL_REFRESH_INTERVAL", "3600"))
+
+# Upstream rate-limit governor: request weight per minute, share kept for interactive
+# requests, longest wait for budget, and circuit breaker settings
+BINANCE_WEIGHT_LIMIT = int(os.getenv("BINANCE_WEIGHT_LIMIT", "6000"))
+BINANCE_WEIGHT_RESERVE = float(os.getenv("BINANCE_WEIGHT_RESERVE", "0.2"))
+BINANCE_MAX_WAIT = float(os.getenv("BINANCE_MAX_WAIT", "10"))
+BINANCE_BREAKER_FAILURES = int(os.getenv("BINANCE_BREAKER_FAILURES", "5"))
+BINANCE_BREAKER_COOLDOWN = float(os.getenv("BINANCE_BREAKER_COOLDOWN", "30"))
+
+# Multi-worker mode: uvicorn worker processes for `python main.py`, and the localhost
+# port workers race to bind to elect the one market-data producer (0 = every worker polls)
+WORKERS = int(os.getenv("WORKERS", "1"))
+PRICE_BUS_PORT = int(os.getenv("PRICE_BUS_PORT", "0"))
+# Seconds between each worker writing its scrape-time gauges when metrics are aggregated
+# across workers (PROMETHEUS_MULTIPROC_DIR set)
+METRICS_GAUGE_INTERVAL = float(os.getenv("METRICS_GAUGE_INTERVAL", "5"))
+
+# Order-book mirror for tracked coins: combined @depth stream, levels kept per side,
+# and levels fetched for one-off books of coins that aren't mirrored
+ORDER_BOOK_ENABLED = os.getenv("ORDER_BOOK_ENABLED", "true").lower() in ("1", "true", "yes")
+BINANCE_DEPTH_STREAM_URL = os.getenv("BINANCE_DEPTH_STREAM_URL", "wss://stream.binance.com:9443/stream")
+ORDER_BOOK_DEPTH = int(os.getenv("ORDER_BOOK_DEPTH", "1000"))
+ORDER_BOOK_FALLBACK_DEPTH = int(os.getenv("ORDER_BOOK_FALLBACK_DEPTH", "100"))
+
+# Streaming holdings import/export: rows validated, written and read per transaction/batch
+HOLDINGS_BATCH_SIZE = int(os.getenv("HOLDINGS_BATCH_SIZE", "5000"))
+
+# Logging: level name, and "json" for one JSON object per line instead of plain text
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
@@ -0,0 +1,19 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+# Default response class for the API: orjson skips the stdlib encoder's Python-level walk
+ResponseClass = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def dumps(value: Any) -> str:
+    """Compact JSON text for websocket frames and the worker bus"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, separators=(",", ":"))
@@ -0,0 +1,39 @@
+import json
+import logging
+
+# LogRecord attributes that are not caller-supplied ``extra`` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message plus any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RESERVED)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Top-level packages whose loggers follow LOG_LEVEL; libraries stay at WARNING or above
+APP_LOGGERS = ("main", "services", "utils", "models")
+
+
+def configure_logging(level: str = "INFO", fmt: str = "text"):
+    """Send application logs to stderr at ``level``, as plain text or JSON lines"""
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(max(logging.getLevelName(level), logging.WARNING))
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level)
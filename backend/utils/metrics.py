@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Set (to an empty directory) when several worker processes serve the API; each worker
+# then writes its metrics to files there and /metrics aggregates all of them
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Buckets in seconds, from sub-millisecond cache hits to slow upstream calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "binance_request_duration_seconds",
+    "Binance REST call latency by endpoint",
+    ["endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Database statement time by statement type",
+    ["statement"],
+    buckets=LATENCY_BUCKETS,
+)
+WS_FANOUT_SECONDS = Histogram(
+    "ws_fanout_duration_seconds",
+    "Time to hand one market-data refresh to every websocket client",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+# Scrape-time gauges and their readers, written out by refresh_gauges in multiprocess mode
+_scrape_gauges: List[Tuple[str, Gauge, Callable[[], float]]] = []
+
+
+def gauge(name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+    """A gauge evaluated on every scrape, for values other components already track"""
+    if not MULTIPROCESS:
+        metric = Gauge(name, documentation)
+        metric.set_function(read)
+        return metric
+    # A scrape can't call into other workers, so each worker keeps its own pid-labelled
+    # series up to date instead; series of exited workers are dropped
+    metric = Gauge(name, documentation, multiprocess_mode="liveall")
+    _scrape_gauges.append((name, metric, read))
+    return metric
+
+
+def refresh_gauges():
+    """Write this worker's current scrape-time gauge values (multiprocess mode only)"""
+    for name, metric, read in _scrape_gauges:
+        try:
+            metric.set(read())
+        except Exception as e:
+            logger.warning("Error reading gauge %s: %s", name, e)
+
+
+def latest() -> bytes:
+    """The /metrics exposition: this process's metrics, or every worker's in multiprocess mode"""
+    if not MULTIPROCESS:
+        return generate_latest()
+    refresh_gauges()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    """Drop this worker's live gauge series on shutdown (multiprocess mode only)"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class GaugeRefresher:
+    """Writes this worker's scrape-time gauges every ``interval`` seconds in multiprocess mode.
+
+    A scrape is answered by one worker, which refreshes its own gauges first;
+    the others' values are at most ``interval`` seconds old.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the periodic refresh task"""
+        if MULTIPROCESS and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the periodic refresh task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            refresh_gauges()
+            await asyncio.sleep(self.interval)
+
+
+def instrument_engine(engine):
+    """Time every statement run through a (sync) SQLAlchemy engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(kind).observe(time.perf_counter() - started)
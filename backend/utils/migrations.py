@@ -0,0 +1,43 @@
+import logging
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from models.models import Base
+
+logger = logging.getLogger(__name__)
+
+
+def run_migrations(engine):
+    """Bring an existing database up to the current schema.
+
+    New tables are created outright. For tables that already exist, any index
+    declared on the model but missing from the database is created; a unique
+    index that fails because of duplicate rows is reported and skipped so the
+    app still starts. Several workers may run this at once, so a table or
+    index that another worker created first is not an error.
+    """
+    # On SQLite, take the write lock up front so concurrent workers queue on busy_timeout
+    # instead of failing to upgrade a read transaction
+    writer = engine.execution_options(sqlite_immediate=True)
+    try:
+        Base.metadata.create_all(bind=writer)
+    except OperationalError:
+        # Lost a CREATE TABLE race; the retry skips whatever now exists
+        Base.metadata.create_all(bind=writer)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                with writer.begin() as conn:
+                    index.create(bind=conn)
+                logger.info("Created index %s on %s", index.name, table.name)
+            except IntegrityError as e:
+                logger.warning("Skipping unique index %s on %s: duplicate rows (%s)", index.name, table.name, e.orig)
+            except OperationalError:
+                if index.name not in {row["name"] for row in inspect(engine).get_indexes(table.name)}:
+                    raise